@@ -11,6 +11,10 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from app.db.base import Base
 from app.models.note import Note
 from app.models.tag import Tag
+from app.models.image import Image
+from app.models.blob import Blob
+from app.models.derivative import ImageDerivative
+from app.models.pending_delete import PendingDelete
 from app.models.associations import note_tags
 from app.core.config import get_settings
 
@@ -0,0 +1,29 @@
+"""drop image url
+
+Revision ID: 4af8f23fccc8
+Revises: 96644b538459
+Create Date: 2026-10-18 10:12:41.503187
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4af8f23fccc8'
+down_revision: Union[str, None] = '96644b538459'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Ссылка на изображение подписывается при выдаче и в БД не хранится
+    op.drop_column('images', 'url')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('images', sa.Column('url', sa.VARCHAR(), autoincrement=False, nullable=True))
@@ -0,0 +1,69 @@
+"""note_tags keys and indexes
+
+Revision ID: 7d3f1a6b8e25
+Revises: e47b2d9c0f13
+Create Date: 2026-10-18 16:27:54.108396
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3f1a6b8e25'
+down_revision: Union[str, None] = 'e47b2d9c0f13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_index_concurrently(name: str, table: str, columns: list, unique: bool = False) -> None:
+    """
+    CREATE INDEX CONCURRENTLY с учетом прошлых запусков миграции:
+    валидный индекс не перестраивается, невалидный (прерванная сборка
+    оставляет его в каталоге и продолжает обновлять при записи) удаляется
+    и строится заново.
+    """
+    valid = None
+    if not context.is_offline_mode():
+        valid = op.get_bind().scalar(
+            sa.text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+            {"name": name}
+        )
+    if valid:
+        return
+    if valid is not None:
+        op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Дубли и неполные связи мешают первичному ключу.
+    # Триггеры note_count вычтут удаленные дубли из счетчиков
+    op.execute("DELETE FROM note_tags WHERE note_id IS NULL OR tag_id IS NULL")
+    op.execute("""
+        DELETE FROM note_tags a USING note_tags b
+        WHERE a.ctid < b.ctid AND a.note_id = b.note_id AND a.tag_id = b.tag_id
+    """)
+    op.alter_column('note_tags', 'note_id', existing_type=sa.String(), nullable=False)
+    op.alter_column('note_tags', 'tag_id', existing_type=sa.String(), nullable=False)
+
+    # Индексы строятся без блокировки записи, вне транзакции миграции
+    with op.get_context().autocommit_block():
+        _create_index_concurrently('note_tags_pkey', 'note_tags', ['note_id', 'tag_id'], unique=True)
+        _create_index_concurrently('ix_note_tags_tag_id_note_id', 'note_tags', ['tag_id', 'note_id'])
+        _create_index_concurrently(op.f('ix_images_note_id'), 'images', ['note_id'])
+    # Готовый уникальный индекс становится первичным ключом без повторного построения
+    op.execute("ALTER TABLE note_tags ADD CONSTRAINT note_tags_pkey PRIMARY KEY USING INDEX note_tags_pkey")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_images_note_id'), table_name='images', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_note_tags_tag_id_note_id', table_name='note_tags', postgresql_concurrently=True, if_exists=True)
+    op.drop_constraint('note_tags_pkey', 'note_tags', type_='primary')
+    op.alter_column('note_tags', 'tag_id', existing_type=sa.String(), nullable=True)
+    op.alter_column('note_tags', 'note_id', existing_type=sa.String(), nullable=True)
@@ -0,0 +1,30 @@
+"""image short url sequence
+
+Revision ID: 9e4a7c0b2f58
+Revises: 3c8f5a2d9b71
+Create Date: 2026-10-18 20:03:17.552914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4a7c0b2f58'
+down_revision: Union[str, None] = '3c8f5a2d9b71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Шаг последовательности - размер блока номеров, резервируемого процессом
+    # (app.models.image.SHORT_URL_BLOCK_SIZE)
+    op.execute(sa.schema.CreateSequence(sa.Sequence('image_short_url_seq', increment=1000)))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(sa.schema.DropSequence(sa.Sequence('image_short_url_seq')))
@@ -0,0 +1,63 @@
+"""object key indexes
+
+Revision ID: c2a7e4f19d63
+Revises: 9e4a7c0b2f58
+Create Date: 2026-10-18 21:04:17.552931
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2a7e4f19d63'
+down_revision: Union[str, None] = '9e4a7c0b2f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Ключи объектов в порядке байтов: сверка читает их из БД постранично
+INDEXES = (
+    ('ix_blobs_object_key', 'blobs', [sa.text("('blobs/' || hash) COLLATE \"C\"")], None),
+    (
+        'ix_images_legacy_object_key', 'images',
+        [sa.text("(note_id::text || '/' || filename) COLLATE \"C\"")], sa.text('blob_hash IS NULL')
+    ),
+    ('ix_image_derivatives_object_key', 'image_derivatives', [sa.text('object_name COLLATE "C"')], None),
+    ('ix_pending_deletes_object_key', 'pending_deletes', [sa.text('object_name COLLATE "C"')], None),
+)
+
+
+def _create_index_concurrently(name: str, table: str, columns: list, where=None) -> None:
+    """
+    CREATE INDEX CONCURRENTLY с учетом прошлых запусков миграции:
+    валидный индекс не перестраивается, невалидный (прерванная сборка)
+    удаляется и строится заново.
+    """
+    valid = None
+    if not context.is_offline_mode():
+        valid = op.get_bind().scalar(
+            sa.text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+            {"name": name}
+        )
+    if valid:
+        return
+    if valid is not None:
+        op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    op.create_index(name, table, columns, postgresql_concurrently=True, postgresql_where=where)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Индексы строятся без блокировки записи, вне транзакции миграции
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            _create_index_concurrently(name, table, columns, where)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
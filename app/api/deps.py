@@ -1,36 +1,60 @@
-from typing import Generator, Optional, Annotated
+from typing import AsyncGenerator, Optional, Annotated
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Path, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import get_settings
-from app.db.session import SessionLocal
+from app.db.replica import LSN_HEADER, parse_lsn
+from app.db.session import SessionLocal, pool_monitor, replica_router
 from app.db.repositories.note import NoteRepository
 from app.db.repositories.tag import TagRepository
 from app.db.repositories.image import ImageRepository
+from app.db.repositories.blob import BlobRepository
+from app.db.repositories.derivative import DerivativeRepository
+from app.db.repositories.pending_delete import PendingDeleteRepository
 from app.models.note import Note
 from app.models.tag import Tag
 from app.models.image import Image
 from app.services.note import NoteService
 from app.services.tag import TagService
 from app.services.image import ImageService
+from app.utils.ids import UUID_PATTERN
 
 settings = get_settings()
 
+# Идентификатор в пути: строка в формате UUID, иначе 422 без обращения к БД
+ObjectId = Annotated[str, Path(pattern=UUID_PATTERN)]
+
 # Будет использоваться для Keycloak
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/login/access-token")
 
 
-def get_db() -> Generator:
+# Методы, которые не меняют данные и могут читать с реплики
+READ_METHODS = ("GET", "HEAD")
+
+
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
     """
     Зависимость для получения сессии базы данных.
+    Соединение берется сразу: при исчерпании пула запрос получает 503.
+    Читающие запросы получают сессию реплики, если она догнала
+    токен клиента из заголовка X-DB-LSN, остальные - основной БД.
     """
-    try:
-        db = SessionLocal()
+    if request.method in READ_METHODS and replica_router.enabled:
+        db = await replica_router.open_session(parse_lsn(request.headers.get(LSN_HEADER)))
+        if db is not None:
+            try:
+                yield db
+            finally:
+                await db.close()
+            return
+
+    async with SessionLocal() as db:
+        await pool_monitor.acquire(db)
         yield db
-    finally:
-        db.close()
+        if request.method not in READ_METHODS:
+            await replica_router.record_write(db)
 
 
 def get_note_repository() -> NoteRepository:
@@ -51,14 +75,48 @@ def get_image_repository() -> ImageRepository:
     return ImageRepository(Image)
 
 
+def get_pending_delete_repository() -> PendingDeleteRepository:
+    """
+    Зависимость для получения очереди удаления объектов хранилища.
+    """
+    return PendingDeleteRepository()
+
+
+def get_blob_repository() -> BlobRepository:
+    """
+    Зависимость для получения репозитория общего содержимого изображений.
+    """
+    return BlobRepository()
+
+
+def get_derivative_repository() -> DerivativeRepository:
+    """
+    Зависимость для получения репозитория превью изображений.
+    """
+    return DerivativeRepository()
+
+
 def get_note_service(
     note_repository: Annotated[NoteRepository, Depends(get_note_repository)],
-    tag_repository: Annotated[TagRepository, Depends(get_tag_repository)]
+    tag_repository: Annotated[TagRepository, Depends(get_tag_repository)],
+    pending_delete_repository: Annotated[
+        PendingDeleteRepository, Depends(get_pending_delete_repository)
+    ],
+    blob_repository: Annotated[BlobRepository, Depends(get_blob_repository)],
+    derivative_repository: Annotated[
+        DerivativeRepository, Depends(get_derivative_repository)
+    ]
 ) -> NoteService:
     """
     Зависимость для получения сервиса заметок.
     """
-    return NoteService(note_repository=note_repository, tag_repository=tag_repository)
+    return NoteService(
+        note_repository=note_repository,
+        tag_repository=tag_repository,
+        pending_delete_repository=pending_delete_repository,
+        blob_repository=blob_repository,
+        derivative_repository=derivative_repository
+    )
 
 
 def get_tag_service(
@@ -72,17 +130,27 @@ def get_tag_service(
 
 def get_image_service(
     image_repository: Annotated[ImageRepository, Depends(get_image_repository)],
-    note_repository: Annotated[NoteRepository, Depends(get_note_repository)]
+    note_repository: Annotated[NoteRepository, Depends(get_note_repository)],
+    pending_delete_repository: Annotated[
+        PendingDeleteRepository, Depends(get_pending_delete_repository)
+    ],
+    blob_repository: Annotated[BlobRepository, Depends(get_blob_repository)],
+    derivative_repository: Annotated[
+        DerivativeRepository, Depends(get_derivative_repository)
+    ]
 ) -> ImageService:
     return ImageService(
         image_repository=image_repository,
-        note_repository=note_repository
+        note_repository=note_repository,
+        pending_delete_repository=pending_delete_repository,
+        blob_repository=blob_repository,
+        derivative_repository=derivative_repository
     )
 
 
 # Будет использоваться для Keycloak
 async def get_current_user(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     token: str = Depends(oauth2_scheme)
 ) -> Optional[dict]:
     """
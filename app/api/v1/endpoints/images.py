@@ -1,20 +1,121 @@
-from typing import List
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
-from sqlalchemy.orm import Session
-from fastapi.responses import RedirectResponse
+from typing import AsyncIterator, List, Optional
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Header, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+from starlette.types import Receive, Scope, Send
 
 from app.api import deps
-from app.schemas.image import Image
+from app.schemas.image import Image, ImageUploadResult
 from app.services.image import ImageService
+from app.storage.disk_cache import CachedObject, disk_cache
 
 router = APIRouter()
 
+# Ключи объектов ({note_id}/{uuid}.ext или blobs/{sha256}) никогда
+# не указывают на другое содержимое, поэтому его можно кэшировать навсегда
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def _iter_body(body) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in body.iter_chunks(STREAM_CHUNK_SIZE):
+            yield chunk
+    finally:
+        body.close()
+
+
+def _object_response(content_type: str, obj: dict) -> Response:
+    """
+    Формирует потоковый ответ из результата get_object.
+    На 304 отдаются валидаторы самого объекта, а не заголовок клиента.
+    """
+    headers = {"Cache-Control": IMAGE_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if obj.get("ETag"):
+        headers["ETag"] = obj["ETag"]
+    if obj.get("LastModified"):
+        headers["Last-Modified"] = format_datetime(obj["LastModified"], usegmt=True)
+    if obj.get("NotModified"):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Length"] = str(obj["ContentLength"])
+    status_code = 200
+    if obj.get("ContentRange"):
+        headers["Content-Range"] = obj["ContentRange"]
+        status_code = 206
+    return StreamingResponse(
+        _iter_body(obj["Body"]),
+        status_code=status_code,
+        headers=headers,
+        media_type=obj.get("ContentType") or content_type
+    )
+
+
+class CachedFileResponse(FileResponse):
+    """
+    Отдача локальной копии из дискового кэша. Копия остается закрепленной,
+    пока файл не отправлен, в том числе при обрыве соединения клиентом.
+    """
+
+    def __init__(self, cached: CachedObject, **kwargs):
+        super().__init__(cached.path, **kwargs)
+        self.cached = cached
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            disk_cache.release(self.cached)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _cached_response(
+    cached: CachedObject,
+    if_none_match: Optional[str],
+    if_modified_since: Optional[datetime]
+) -> Response:
+    """
+    Отдает локальную копию объекта. FileResponse использует отправку файла
+    без копирования (pathsend), если ее поддерживает сервер.
+    Закрепление копии снимается после отправки.
+    """
+    headers = {
+        "Cache-Control": IMAGE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+        "ETag": cached.etag
+    }
+    if cached.last_modified:
+        headers["Last-Modified"] = format_datetime(cached.last_modified, usegmt=True)
+    if if_none_match:
+        if _etag_matches(if_none_match, cached.etag):
+            disk_cache.release(cached)
+            return Response(status_code=304, headers=headers)
+    elif if_modified_since and cached.last_modified and cached.last_modified <= if_modified_since:
+        disk_cache.release(cached)
+        return Response(status_code=304, headers=headers)
+    return CachedFileResponse(cached, headers=headers, media_type=cached.content_type)
+
 
 @router.post("/notes/{note_id}/images", response_model=Image)
 async def upload_image(
-    note_id: str,
+    note_id: deps.ObjectId,
     file: UploadFile = File(...),
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     image_service: ImageService = Depends(deps.get_image_service)
 ) -> Image:
     """
@@ -23,22 +124,70 @@ async def upload_image(
     return await image_service.upload_image(db=db, note_id=note_id, file=file)
 
 
+@router.post("/notes/{note_id}/images/bulk", response_model=List[ImageUploadResult])
+async def upload_images(
+    note_id: deps.ObjectId,
+    files: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(deps.get_db),
+    image_service: ImageService = Depends(deps.get_image_service)
+) -> List[ImageUploadResult]:
+    """
+    Загружает несколько изображений для заметки одним запросом.
+    Возвращает результат по каждому файлу.
+    """
+    return await image_service.upload_images(db=db, note_id=note_id, files=files)
+
+
 @router.get("/notes/{note_id}/images", response_model=List[Image])
-def get_note_images(
-    note_id: str,
-    db: Session = Depends(deps.get_db),
+async def get_note_images(
+    note_id: deps.ObjectId,
+    db: AsyncSession = Depends(deps.get_db),
     image_service: ImageService = Depends(deps.get_image_service)
 ) -> List[Image]:
     """
     Получает все изображения для заметки.
     """
-    return image_service.get_by_note(db=db, note_id=note_id)
+    return await image_service.get_by_note(db=db, note_id=note_id)
+
+
+@router.get("/images/{image_id}/content")
+async def get_image_content(
+    image_id: deps.ObjectId,
+    range: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    size: Optional[int] = Query(None, description="Размер превью по большей стороне"),
+    db: AsyncSession = Depends(deps.get_db),
+    image_service: ImageService = Depends(deps.get_image_service)
+) -> Response:
+    """
+    Потоково отдает содержимое изображения из хранилища.
+    Поддерживает Range, If-None-Match и If-Modified-Since.
+    С параметром size отдает превью, генерируя его при первом запросе.
+    Если включен дисковый кэш, запросы без Range отдаются с локального диска.
+    """
+    if disk_cache.enabled and not range:
+        image, cached = await image_service.open_cached_image(
+            db=db, image_id=image_id, size=size
+        )
+        if cached is not None:
+            return _cached_response(cached, if_none_match, _parse_http_date(if_modified_since))
+
+    image, obj = await image_service.open_image(
+        db=db,
+        image_id=image_id,
+        byte_range=range,
+        if_none_match=if_none_match,
+        if_modified_since=None if if_none_match else _parse_http_date(if_modified_since),
+        size=size
+    )
+    return _object_response(image.content_type, obj)
 
 
 @router.delete("/images/{image_id}")
 async def delete_image(
-    image_id: str,
-    db: Session = Depends(deps.get_db),
+    image_id: deps.ObjectId,
+    db: AsyncSession = Depends(deps.get_db),
     image_service: ImageService = Depends(deps.get_image_service)
 ) -> dict:
     """
@@ -51,15 +200,16 @@ async def delete_image(
 @router.get("/i/{short_url}")
 async def get_image_by_short_url(
     short_url: str,
-    db: Session = Depends(deps.get_db),
+    size: Optional[int] = Query(None, description="Размер превью по большей стороне"),
+    db: AsyncSession = Depends(deps.get_db),
     image_service: ImageService = Depends(deps.get_image_service)
 ):
     """
     Получение изображения по короткому URL.
-    Перенаправляет на полный URL изображения.
+    Перенаправляет на подписанную ссылку в хранилище.
     """
-    image = image_service.get_by_short_url(db=db, short_url=short_url)
+    image = await image_service.get_by_short_url(db=db, short_url=short_url)
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
     
-    return RedirectResponse(url=image.url) 
\ No newline at end of file
+    return RedirectResponse(url=await image_service.get_url(image, db=db, size=size)) 
\ No newline at end of file
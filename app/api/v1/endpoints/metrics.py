@@ -0,0 +1,37 @@
+from fastapi import APIRouter
+
+from app.db.session import pool_monitor, replica_router
+from app.services.reconcile import reconciler
+from app.storage.disk_cache import disk_cache
+from app.storage.minio import storage
+
+router = APIRouter()
+
+
+@router.get("/storage")
+async def read_storage_metrics() -> dict:
+    """
+    Счетчики пула соединений с хранилищем и локального дискового кэша.
+    """
+    return {**storage.get_stats(), "disk_cache": disk_cache.get_stats()}
+
+
+@router.get("/database")
+async def read_database_metrics() -> dict:
+    """
+    Счетчики пула соединений с БД: занятые соединения, переполнение и ожидание.
+    Для реплик - те же счетчики и число запросов, перенаправленных на основную БД.
+    """
+    return {**pool_monitor.get_stats(), "replication": replica_router.get_stats()}
+
+
+@router.get("/reconcile")
+async def read_reconcile_metrics() -> dict:
+    """
+    Итоги последней сверки хранилища и БД.
+    """
+    report = reconciler.last_report
+    return {
+        "running": reconciler.running,
+        "last_report": report.as_dict() if report else None
+    }
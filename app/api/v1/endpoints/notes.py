@@ -1,84 +1,175 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Literal, Optional, Union
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
 from app.api import deps
-from app.schemas.note import Note, NoteCreate, NoteUpdate, NoteUpdateExternal
+from app.core.exceptions import BadRequestException
+from app.schemas.note import (
+    Note,
+    NoteBulkResult,
+    NoteCreate,
+    NoteUpdate,
+    NoteUpdateExternal,
+    NoteSearchResult
+)
+from app.schemas.pagination import CursorPage
 from app.services.note import NoteService
 from app.services.tag import TagService
+from app.utils.pagination import MAX_PAGE_SIZE
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[Note])
-def read_notes(
+def _note_etag(note: Note) -> str:
+    """ETag заметки - ее версия"""
+    return f'"{note.version}"'
+
+
+def _parse_if_match(value: Optional[str]) -> Optional[List[int]]:
+    """
+    Допустимые версии заметки из заголовка If-Match.
+    Принимает список ETag через запятую (`"3", W/"4"`) или номеров версий;
+    `*` и отсутствие заголовка - без проверки
+    """
+    if value is None:
+        return None
+    candidates = [candidate.strip() for candidate in value.split(",")]
+    if "*" in candidates:
+        return None
+    versions = []
+    for tag in candidates:
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        try:
+            versions.append(int(tag.strip('"')))
+        except ValueError:
+            raise BadRequestException(f"Некорректный заголовок If-Match: {value}")
+    return versions
+
+
+@router.get("/", response_model=Union[List[Note], CursorPage[Note]])
+async def read_notes(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     skip: int = 0,
-    limit: int = 20,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: Literal["created_at", "updated_at"] = "created_at",
     note_service: NoteService = Depends(deps.get_note_service)
-) -> List[Note]:
+) -> Union[List[Note], CursorPage[Note]]:
     """
-    Получение списка заметок с пагинацией
+    Получение списка заметок с пагинацией.
+
+    - Без `cursor` - список по skip/limit
+    - С `cursor` (пустой для первой страницы) - страница от новых к старым
+      по `sort` и `next_cursor` для следующей страницы
     """ 
-    return note_service.get_list(db=db, skip=skip, limit=limit)
+    if cursor is not None:
+        return await note_service.get_page(db=db, cursor=cursor, limit=limit, sort=sort)
+    return await note_service.get_list(db=db, skip=skip, limit=limit)
+
+@router.get("/search", response_model=CursorPage[NoteSearchResult])
+async def search_notes(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    q: str = Query(..., min_length=1, max_length=500),
+    tag: Optional[List[str]] = Query(None),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    note_service: NoteService = Depends(deps.get_note_service)
+) -> CursorPage[NoteSearchResult]:
+    """
+    Полнотекстовый поиск по заголовку и тексту заметок.
+
+    - `q` - запрос в синтаксисе веб-поиска: слова, "фраза", -исключение, or
+    - `tag` (можно несколько) - только заметки со всеми указанными тегами
+    - `cursor` - курсор следующей страницы из `next_cursor`
+    """
+    return await note_service.search(db=db, query=q, tags=tag, cursor=cursor, limit=limit)
 
 @router.get("/{note_id}", response_model=Note)
-def read_note(
+async def read_note(
     *,
-    db: Session = Depends(deps.get_db),
-    note_id: str,
+    db: AsyncSession = Depends(deps.get_db),
+    note_id: deps.ObjectId,
+    response: Response,
     note_service: NoteService = Depends(deps.get_note_service)
 ) -> Note:
     """
     Получение заметки по ID.
     """
-    note = note_service.get(db=db, id=note_id)
+    note = await note_service.get(db=db, id=note_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
+    response.headers["ETag"] = _note_etag(note)
     return note
 
 @router.post("/", response_model=Note)
-def create_note(
+async def create_note(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     note_in: NoteCreate,
     note_service: NoteService = Depends(deps.get_note_service)
 ) -> Note:
     """
     Создание новой заметки.
     """
-    return note_service.create(db=db, obj_in=note_in)
+    return await note_service.create(db=db, obj_in=note_in)
 
 
+@router.post("/bulk", response_model=List[NoteBulkResult])
+async def create_notes_bulk(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    items: List[Dict[str, Any]] = Body(...),
+    note_service: NoteService = Depends(deps.get_note_service)
+) -> List[NoteBulkResult]:
+    """
+    Пакетное создание заметок.
+    Элементы как у POST /notes/, плюс `tags` - список имен тегов
+    (отсутствующие теги создаются). Возвращает результат по каждому элементу.
+    """
+    return await note_service.bulk_create(db=db, items=items)
+
 @router.patch("/{note_id}", response_model=Note)
-def patch_note(
+async def patch_note(
     *,
-    db: Session = Depends(deps.get_db),
-    note_id: str,
+    db: AsyncSession = Depends(deps.get_db),
+    note_id: deps.ObjectId,
     note_in: NoteUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     note_service: NoteService = Depends(deps.get_note_service)
 ) -> Note:
     """
         Patch заметки
+
+    - `If-Match` (опционально): ETag или версия, на основе которой сделано изменение.
+      Если заметку уже изменили, возвращается 412 и изменение не применяется
     """
-    note = note_service.patch(db=db, note_id=note_id, obj_in=note_in)
+    note = await note_service.patch(
+        db=db,
+        note_id=note_id,
+        obj_in=note_in,
+        expected_versions=_parse_if_match(if_match)
+    )
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
+    response.headers["ETag"] = _note_etag(note)
     return note
 
 @router.delete("/{note_id}", response_model=Note)
-def delete_note(
+async def delete_note(
     *,
-    db: Session = Depends(deps.get_db),
-    note_id: str,
+    db: AsyncSession = Depends(deps.get_db),
+    note_id: deps.ObjectId,
     note_service: NoteService = Depends(deps.get_note_service)
 ) -> Note:
     """
     Удаление заметки.
     """
-    note = note_service.remove(db=db, id=note_id)
+    note = await note_service.remove(db=db, id=note_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     return note
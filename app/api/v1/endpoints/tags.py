@@ -1,68 +1,80 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import List, Literal, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
+from app.schemas.pagination import CursorPage
 from app.schemas.tag import Tag, TagCreate, TagUpdate
 from app.services.tag import TagService
+from app.utils.pagination import MAX_PAGE_SIZE
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[Tag])
-def read_tags(
+@router.get("/", response_model=Union[List[Tag], CursorPage[Tag]])
+async def read_tags(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: Optional[Literal["name", "popularity"]] = None,
     tag_service: TagService = Depends(deps.get_tag_service)
-) -> List[Tag]:
+) -> Union[List[Tag], CursorPage[Tag]]:
     """
     Получение списка тегов.
+
+    - `sort=name` - по алфавиту, `sort=popularity` - по убыванию числа заметок
+    - С параметром `cursor` (пустым для первой страницы) возвращает страницу
+      и `next_cursor`, по умолчанию по алфавиту
     """
-    return tag_service.get_list(db=db, skip=skip, limit=limit)
+    if cursor is not None:
+        return await tag_service.get_page(db=db, cursor=cursor, limit=limit, sort=sort or "name")
+    if sort is not None:
+        return await tag_service.get_sorted(db=db, sort=sort, skip=skip, limit=limit)
+    return await tag_service.get_list(db=db, skip=skip, limit=limit)
 
 
 @router.post("/", response_model=Tag)
-def create_tag(
+async def create_tag(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     tag_in: TagCreate,
     tag_service: TagService = Depends(deps.get_tag_service)
 ) -> Tag:
     """
     Создание нового тега.
     """
-    tag = tag_service.get_by_name(db=db, tag_name=tag_in.name)
+    tag = await tag_service.get_by_name(db=db, tag_name=tag_in.name)
     if tag:
         raise HTTPException(
             status_code=400,
             detail="Tag with this name already exists"
         )
-    return tag_service.create(db=db, obj_in=tag_in)
+    return await tag_service.create(db=db, obj_in=tag_in)
 
 
 @router.delete("/{tag_id}", response_model=Tag)
-def delete_tag(
+async def delete_tag(
     *,
-    db: Session = Depends(deps.get_db),
-    tag_id: str,
+    db: AsyncSession = Depends(deps.get_db),
+    tag_id: deps.ObjectId,
     tag_service: TagService = Depends(deps.get_tag_service)
 ) -> Tag:
     """
     Удаление тега.
     """
-    tag = tag_service.remove(db=db, id=tag_id)
+    tag = await tag_service.remove(db=db, id=tag_id)
     if not tag:
         raise HTTPException(status_code=404, detail="Tag not found")
     return tag
 
 
 @router.put("/{tag_id}", response_model=Tag)
-def update_tag(
+async def update_tag(
     *,
-    db: Session = Depends(deps.get_db),
-    tag_id: str,
+    db: AsyncSession = Depends(deps.get_db),
+    tag_id: deps.ObjectId,
     tag_in: TagUpdate,
     tag_service: TagService = Depends(deps.get_tag_service)
 ) -> Tag:
@@ -73,13 +85,13 @@ def update_tag(
     - Если тег не найден, вернет ошибку 404
     """
     # Проверяем существование тега
-    tag = tag_service.get(db=db, id=tag_id)
+    tag = await tag_service.get(db=db, id=tag_id)
     if not tag:
         raise HTTPException(status_code=404, detail="Tag not found")
     
     # Если передано новое имя, проверяем что оно не занято
     if tag_in.name is not None and tag_in.name != tag.name:
-        existing_tag = tag_service.get_by_name(db=db, name=tag_in.name)
+        existing_tag = await tag_service.get_by_name(db=db, tag_name=tag_in.name)
         if existing_tag:
             raise HTTPException(
                 status_code=400,
@@ -87,5 +99,5 @@ def update_tag(
             )
     
     # Обновляем тег
-    updated_tag = tag_service.update(db=db, db_obj=tag, obj_in=tag_in)
+    updated_tag = await tag_service.update(db=db, db_obj=tag, obj_in=tag_in)
     return updated_tag
\ No newline at end of file
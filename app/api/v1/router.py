@@ -1,8 +1,9 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import notes, tags, images
+from app.api.v1.endpoints import notes, tags, images, metrics
  
 api_router = APIRouter()
 api_router.include_router(notes.router, prefix="/notes", tags=["notes"])
 api_router.include_router(tags.router, prefix="/tags", tags=["tags"])
-api_router.include_router(images.router, prefix="/images", tags=["images"]) 
\ No newline at end of file
+api_router.include_router(images.router, prefix="/images", tags=["images"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"]) 
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Сравнение строковых и нативных UUID-идентификаторов на синтетических данных:
+размер таблиц и индексов и время соединений заметок с тегами.
+Данные создаются во временной схеме bench_ids и удаляются после замера.
+
+    python -m app.commands.benchmark_ids
+    python -m app.commands.benchmark_ids --notes 1000000 --tags 5000 --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.session import engine
+
+SCHEMA = "bench_ids"
+# Тип идентификатора, он же суффикс таблиц варианта
+KINDS = ("varchar", "uuid")
+
+# Соединения, как в API: заметки по тегу, теги страницы заметок, число заметок по тегам
+QUERIES = {
+    "notes_by_tag": """
+        SELECT n.id, n.created_at FROM {s}.note_{k} n
+        JOIN {s}.note_tags_{k} nt ON nt.note_id = n.id
+        JOIN {s}.tag_{k} t ON t.id = nt.tag_id
+        WHERE t.name = 'tag-1'
+        ORDER BY n.created_at DESC, n.id DESC LIMIT 20
+    """,
+    "tags_of_notes": """
+        SELECT nt.note_id, t.name FROM {s}.note_tags_{k} nt
+        JOIN {s}.tag_{k} t ON t.id = nt.tag_id
+        WHERE nt.note_id IN (SELECT id FROM {s}.note_{k} ORDER BY created_at DESC, id DESC LIMIT 100)
+    """,
+    "count_by_tag": """
+        SELECT t.name, count(*) FROM {s}.note_tags_{k} nt
+        JOIN {s}.note_{k} n ON n.id = nt.note_id
+        JOIN {s}.tag_{k} t ON t.id = nt.tag_id
+        GROUP BY t.name
+    """,
+}
+
+
+async def seed(conn: AsyncConnection, notes: int, tags: int, tags_per_note: int) -> None:
+    await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    for kind in KINDS:
+        for statement in (
+            f"CREATE TABLE {SCHEMA}.note_{kind} (id {kind} PRIMARY KEY, created_at timestamp NOT NULL)",
+            f"CREATE TABLE {SCHEMA}.tag_{kind} (id {kind} PRIMARY KEY, name varchar UNIQUE NOT NULL)",
+            f"""CREATE TABLE {SCHEMA}.note_tags_{kind} (
+                note_id {kind} NOT NULL REFERENCES {SCHEMA}.note_{kind} (id),
+                tag_id {kind} NOT NULL REFERENCES {SCHEMA}.tag_{kind} (id),
+                PRIMARY KEY (note_id, tag_id)
+            )""",
+            f"CREATE INDEX ON {SCHEMA}.note_tags_{kind} (tag_id, note_id)",
+            f"CREATE INDEX ON {SCHEMA}.note_{kind} (created_at, id)",
+        ):
+            await conn.execute(text(statement))
+
+    # Одинаковые данные в обоих вариантах: сначала uuid, затем их строковые копии
+    await conn.execute(text(f"""
+        INSERT INTO {SCHEMA}.note_uuid
+        SELECT gen_random_uuid(), now() - i * interval '1 second' FROM generate_series(1, :notes) AS i
+    """), {"notes": notes})
+    await conn.execute(text(f"""
+        INSERT INTO {SCHEMA}.tag_uuid
+        SELECT gen_random_uuid(), 'tag-' || i FROM generate_series(1, :tags) AS i
+    """), {"tags": tags})
+    await conn.execute(text(f"""
+        INSERT INTO {SCHEMA}.note_tags_uuid
+        SELECT DISTINCT n.id, t.id
+        FROM (SELECT id, row_number() OVER () AS rn FROM {SCHEMA}.note_uuid) n
+        CROSS JOIN generate_series(1, :per_note) AS k
+        JOIN (SELECT id, row_number() OVER (ORDER BY name) AS rn FROM {SCHEMA}.tag_uuid) t
+            ON t.rn = 1 + ((n.rn * 7919 + k * 104729) % :tags)
+    """), {"per_note": tags_per_note, "tags": tags})
+    await conn.execute(text(f"INSERT INTO {SCHEMA}.note_varchar SELECT id::text, created_at FROM {SCHEMA}.note_uuid"))
+    await conn.execute(text(f"INSERT INTO {SCHEMA}.tag_varchar SELECT id::text, name FROM {SCHEMA}.tag_uuid"))
+    await conn.execute(text(
+        f"INSERT INTO {SCHEMA}.note_tags_varchar SELECT note_id::text, tag_id::text FROM {SCHEMA}.note_tags_uuid"
+    ))
+    for kind in KINDS:
+        for table in ("note", "tag", "note_tags"):
+            await conn.execute(text(f"ANALYZE {SCHEMA}.{table}_{kind}"))
+
+
+async def relation_sizes(conn: AsyncConnection, kind: str) -> dict:
+    """Размеры таблиц и индексов варианта в байтах"""
+    result = await conn.execute(text("""
+        SELECT c.relname, c.relkind, pg_relation_size(c.oid) AS bytes
+        FROM pg_class c JOIN pg_namespace ns ON ns.oid = c.relnamespace
+        WHERE ns.nspname = :schema AND c.relkind IN ('r', 'i') AND c.relname LIKE :pattern
+        ORDER BY c.relname
+    """), {"schema": SCHEMA, "pattern": f"%\\_{kind}%"})
+    sizes = {"tables": {}, "indexes": {}}
+    for row in result:
+        sizes["tables" if row.relkind == "r" else "indexes"][row.relname] = row.bytes
+    return sizes
+
+
+async def execution_ms(conn: AsyncConnection, query: str, repeat: int) -> float:
+    """Медиана времени выполнения на сервере (без сети), первый прогон прогревает кэш"""
+    timings = []
+    for _ in range(repeat + 1):
+        plan = await conn.scalar(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}"))
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        timings.append(plan[0]["Execution Time"])
+    return round(statistics.median(timings[1:]), 3)
+
+
+async def main(notes: int, tags: int, tags_per_note: int, repeat: int, keep: bool) -> dict:
+    report = {"notes": notes, "tags": tags, "tags_per_note": tags_per_note}
+    try:
+        async with engine.begin() as conn:
+            await seed(conn, notes, tags, tags_per_note)
+        async with engine.connect() as conn:
+            for kind in KINDS:
+                sizes = await relation_sizes(conn, kind)
+                report[kind] = {
+                    **sizes,
+                    "index_bytes_total": sum(sizes["indexes"].values()),
+                    "execution_ms": {
+                        name: await execution_ms(conn, query.format(s=SCHEMA, k=kind), repeat)
+                        for name, query in QUERIES.items()
+                    },
+                }
+        report["index_size_ratio"] = round(
+            report["varchar"]["index_bytes_total"] / max(report["uuid"]["index_bytes_total"], 1), 2
+        )
+    finally:
+        if not keep:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение строковых и UUID-идентификаторов")
+    parser.add_argument("--notes", type=int, default=200_000, help="число заметок")
+    parser.add_argument("--tags", type=int, default=1000, help="число тегов")
+    parser.add_argument("--tags-per-note", type=int, default=3, help="тегов на заметку")
+    parser.add_argument("--repeat", type=int, default=10, help="прогонов каждого запроса")
+    parser.add_argument("--keep", action="store_true", help="не удалять схему bench_ids")
+    args = parser.parse_args()
+    print(json.dumps(
+        asyncio.run(main(args.notes, args.tags, args.tags_per_note, args.repeat, args.keep)),
+        ensure_ascii=False,
+        indent=2
+    ))
@@ -0,0 +1,30 @@
+"""
+Сверка бакета MinIO и БД.
+
+    python -m app.commands.reconcile            # только отчет
+    python -m app.commands.reconcile --fix      # удалить сирот и висячие записи
+"""
+import argparse
+import asyncio
+import json
+
+from app.db.session import engine
+from app.services.reconcile import reconciler
+from app.storage.minio import storage
+
+
+async def main(fix: bool) -> dict:
+    await storage.connect()
+    try:
+        report = await reconciler.run(dry_run=not fix)
+    finally:
+        await storage.close()
+        await engine.dispose()
+    return report.as_dict()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сверка хранилища и базы данных")
+    parser.add_argument("--fix", action="store_true", help="исправить найденные расхождения")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.fix)), default=str, ensure_ascii=False, indent=2))
@@ -0,0 +1,22 @@
+"""
+Пересчет счетчиков заметок у тегов (tag.note_count).
+
+    python -m app.commands.recount_tags
+"""
+import asyncio
+
+from app.db.repositories.tag import TagRepository
+from app.db.session import SessionLocal, engine
+from app.models.tag import Tag
+
+
+async def main() -> int:
+    try:
+        async with SessionLocal() as db:
+            return await TagRepository(Tag).recount_note_counts(db)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    print(f"Исправлено счетчиков: {asyncio.run(main())}")
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 from pydantic import PostgresDsn, validator
 from functools import lru_cache
@@ -15,6 +15,27 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = "notes_db"
     POSTGRES_PORT: int = 5434
     SQLALCHEMY_DATABASE_URI: Optional[PostgresDsn] = None
+    # Тот же DSN для драйвера asyncpg, используется приложением (alembic работает синхронно)
+    ASYNC_DATABASE_URI: Optional[str] = None
+    # Пул соединений с БД
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    # Сколько ждать свободное соединение; при исчерпании пула запрос получает 503
+    DB_POOL_TIMEOUT: float = 2.0
+    DB_POOL_RECYCLE: int = 1800
+    # Проверка соединения запросом при каждой выдаче из пула (лишний round-trip).
+    # Без нее устаревшие соединения отсекаются по DB_POOL_RECYCLE
+    DB_POOL_PRE_PING: bool = False
+    DB_POOL_RETRY_AFTER: int = 1
+    # Реплики для чтения (DSN postgresql://...): GET-запросы распределяются между ними.
+    # Пусто - все запросы обслуживает основная БД
+    DB_REPLICA_URIS: List[str] = []
+    ASYNC_REPLICA_URIS: List[str] = []
+    # Заголовок X-DB-Query-Count с числом запросов к БД (для отладки N+1)
+    DB_QUERY_COUNT_HEADER: bool = False
+
+    # Пакетное создание заметок
+    NOTE_BULK_CREATE_MAX_ITEMS: int = 1000
 
     # MinIO
     MINIO_SERVER: str = "localhost"
@@ -23,6 +44,44 @@ class Settings(BaseSettings):
     MINIO_ROOT_PASSWORD: str = "minioadmin"
     MINIO_SECURE: bool = False
     MINIO_BUCKET_NAME: str = "notes"
+    # Пул соединений общего S3-клиента
+    MINIO_MAX_POOL_CONNECTIONS: int = 50
+    MINIO_KEEPALIVE_TIMEOUT: float = 30.0
+    MINIO_CONNECT_TIMEOUT: float = 5.0
+    MINIO_READ_TIMEOUT: float = 60.0
+    MINIO_MAX_RETRIES: int = 3
+    # Потоковая загрузка: размер части multipart (не меньше 5 МБ по требованиям S3)
+    MINIO_MULTIPART_CHUNK_SIZE: int = 8 * 1024 * 1024
+    IMAGE_MAX_SIZE: int = 50 * 1024 * 1024
+    IMAGE_BULK_UPLOAD_MAX_FILES: int = 50
+    IMAGE_BULK_UPLOAD_CONCURRENCY: int = 4
+    # Подписанные ссылки на изображения
+    # Адрес MinIO, доступный клиентам (например, https://files.example.com).
+    # Если не задан, ссылки подписываются для внутреннего адреса MINIO_SERVER:MINIO_PORT
+    MINIO_PUBLIC_URL: Optional[str] = None
+    MINIO_PRESIGNED_URL_EXPIRES: int = 3600
+    MINIO_PRESIGNED_URL_REFRESH_MARGIN: int = 300
+    MINIO_PRESIGNED_URL_CACHE_SIZE: int = 10000
+    # Производные изображения (превью)
+    IMAGE_DERIVATIVE_SIZES: List[int] = [256, 1024]
+    IMAGE_DERIVATIVE_FORMAT: str = "webp"
+    IMAGE_DERIVATIVE_QUALITY: int = 80
+    IMAGE_DERIVATIVE_WORKERS: int = 2
+
+    # Локальный дисковый кэш горячих изображений (выключен, если каталог не задан)
+    IMAGE_DISK_CACHE_DIR: Optional[str] = None
+    IMAGE_DISK_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024
+    IMAGE_DISK_CACHE_MAX_ITEM_BYTES: int = 20 * 1024 * 1024
+
+    # Фоновое удаление объектов хранилища
+    PURGE_BATCH_SIZE: int = 1000
+    PURGE_INTERVAL: float = 30.0
+    PURGE_RETRY_DELAY: float = 300.0
+
+    # Сверка бакета и БД (периодический запуск выключен, если интервал не задан)
+    RECONCILE_INTERVAL: Optional[float] = None
+    RECONCILE_FIX: bool = False
+    RECONCILE_GRACE_PERIOD: float = 3600.0
 
     @validator("SQLALCHEMY_DATABASE_URI", pre=True)
     def assemble_db_connection(cls, v: Optional[str], values: dict[str, any]) -> any:
@@ -55,6 +114,13 @@ class Settings(BaseSettings):
             f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
             f"@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
+        self.ASYNC_DATABASE_URI = self.SQLALCHEMY_DATABASE_URI.replace(
+            "postgresql://", "postgresql+asyncpg://", 1
+        )
+        self.ASYNC_REPLICA_URIS = [
+            uri.replace("postgresql://", "postgresql+asyncpg://", 1)
+            for uri in self.DB_REPLICA_URIS
+        ]
 
     class Config:
         case_sensitive = True
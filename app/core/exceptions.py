@@ -34,6 +34,35 @@ class StorageException(AppException):
     def __init__(self, detail: str = "Ошибка хранилища") -> None:
         super().__init__(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=detail)
 
+class PayloadTooLargeException(AppException):
+    """Исключение для превышения допустимого размера загружаемого файла"""
+    def __init__(self, detail: str = "Файл слишком большой") -> None:
+        super().__init__(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
+class RangeNotSatisfiableException(AppException):
+    """Исключение для запроса недопустимого диапазона байт"""
+    def __init__(self, detail: str = "Недопустимый диапазон") -> None:
+        super().__init__(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, detail=detail)
+
+class BadRequestException(AppException):
+    """Исключение для некорректного запроса (например, заголовка)"""
+    def __init__(self, detail: str = "Некорректный запрос") -> None:
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+class PreconditionFailedException(AppException):
+    """Исключение для невыполненного условия запроса (If-Match)"""
+    def __init__(self, detail: str = "Условие запроса не выполнено") -> None:
+        super().__init__(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=detail)
+
+class ServiceUnavailableException(AppException):
+    """Исключение для временной перегрузки сервиса"""
+    def __init__(self, detail: str = "Сервис временно недоступен", retry_after: int = 1) -> None:
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)}
+        )
+
 async def http_exception_handler(request: Request, exc: HTTPException) -> JSONResponse:
     """Обработчик для HTTP исключений"""
     return JSONResponse(
@@ -44,7 +73,8 @@ async def http_exception_handler(request: Request, exc: HTTPException) -> JSONRe
                 "message": str(exc.detail),
                 "type": exc.__class__.__name__
             }
-        }
+        },
+        headers=getattr(exc, "headers", None)
     )
 
 async def validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
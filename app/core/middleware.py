@@ -0,0 +1,70 @@
+import re
+from typing import Optional
+
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+from app.core.exceptions import PayloadTooLargeException, http_exception_handler
+
+settings = get_settings()
+
+# Запас на заголовки частей multipart на каждый файл
+MULTIPART_OVERHEAD = 64 * 1024
+
+_SINGLE_UPLOAD_PATH = re.compile(r"/images/notes/[^/]+/images$")
+_BULK_UPLOAD_PATH = re.compile(r"/images/notes/[^/]+/images/bulk$")
+
+
+def upload_size_limit(path: str) -> Optional[int]:
+    """
+    Предельный размер тела запроса загрузки изображений или None для остальных путей.
+    """
+    if _SINGLE_UPLOAD_PATH.search(path):
+        return settings.IMAGE_MAX_SIZE + MULTIPART_OVERHEAD
+    if _BULK_UPLOAD_PATH.search(path):
+        return settings.IMAGE_BULK_UPLOAD_MAX_FILES * (settings.IMAGE_MAX_SIZE + MULTIPART_OVERHEAD)
+    return None
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Ограничивает размер тела запросов загрузки до того, как Starlette
+    сохранит его во временный файл: по Content-Length сразу,
+    при chunked-передаче - по мере чтения тела.
+    Точный лимит на файл (IMAGE_MAX_SIZE) проверяется при обработке загрузки.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        limit = upload_size_limit(scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Размер запроса превышает допустимые {limit} байт"
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = await http_exception_handler(
+                Request(scope), PayloadTooLargeException(detail)
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise PayloadTooLargeException(detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,79 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.core.config import get_settings
+from app.core.exceptions import ServiceUnavailableException
+
+settings = get_settings()
+
+
+class PoolMonitor:
+    """
+    Счетчики пула соединений с БД.
+    Соединение для запроса берется заранее, чтобы измерить ожидание
+    и при исчерпании пула сразу ответить 503 с Retry-After.
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.checkouts_total = 0
+        self.timeouts_total = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.connects_total = 0
+        self.invalidated_total = 0
+        event.listen(engine.sync_engine, "connect", self._on_connect)
+        event.listen(engine.sync_engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        self.connects_total += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception) -> None:
+        self.invalidated_total += 1
+
+    async def acquire(self, db: AsyncSession) -> None:
+        """
+        Берет соединение для сессии, ожидая не дольше DB_POOL_TIMEOUT.
+        """
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        started = time.monotonic()
+        try:
+            await db.connection()
+        except PoolTimeoutError:
+            self.timeouts_total += 1
+            raise ServiceUnavailableException(
+                "Нет свободных соединений с базой данных",
+                retry_after=settings.DB_POOL_RETRY_AFTER
+            )
+        finally:
+            self.waiting -= 1
+            elapsed = time.monotonic() - started
+            self.wait_time_total += elapsed
+            self.wait_time_max = max(self.wait_time_max, elapsed)
+        self.checkouts_total += 1
+
+    def get_stats(self) -> dict:
+        pool = self.engine.pool
+        attempts = self.checkouts_total + self.timeouts_total
+        return {
+            "pool_size": pool.size(),
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            # До заполнения основного пула счетчик SQLAlchemy отрицательный
+            "overflow": max(pool.overflow(), 0),
+            "waiting": self.waiting,
+            "peak_waiting": self.peak_waiting,
+            "checkouts_total": self.checkouts_total,
+            "timeouts_total": self.timeouts_total,
+            "wait_time_avg_ms": round(self.wait_time_total / attempts * 1000, 3) if attempts else 0,
+            "wait_time_max_ms": round(self.wait_time_max * 1000, 3),
+            "connects_total": self.connects_total,
+            "invalidated_total": self.invalidated_total,
+        }
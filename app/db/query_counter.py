@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+_current: ContextVar[Optional["QueryCounter"]] = ContextVar("query_counter", default=None)
+
+
+class QueryCounter:
+    """Запросы к БД, выполненные внутри count_queries()"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter = _current.get()
+    if counter is not None:
+        counter.statements.append(statement)
+
+
+def install(engine: AsyncEngine) -> None:
+    """
+    Подключает подсчет запросов к движку.
+    """
+    if not event.contains(engine.sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """
+    Считает запросы текущего контекста (запроса или задачи asyncio).
+    """
+    counter = QueryCounter()
+    token = _current.set(counter)
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryCounter]:
+    """
+    Проверяет, что блок выполнил не больше `limit` запросов.
+    Ловит N+1: число запросов не должно расти с размером страницы.
+    """
+    with count_queries() as counter:
+        yield counter
+    if counter.count > limit:
+        statements = "\n".join(counter.statements)
+        raise AssertionError(
+            f"Ожидалось не больше {limit} запросов, выполнено {counter.count}:\n{statements}"
+        )
@@ -0,0 +1,142 @@
+import itertools
+import logging
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.exceptions import ServiceUnavailableException
+from app.db.pool import PoolMonitor
+
+logger = logging.getLogger(__name__)
+
+# Заголовок с позицией WAL последней записи клиента (read-your-writes)
+LSN_HEADER = "X-DB-LSN"
+_LSN_PATTERN = re.compile(r"^[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}$")
+
+_current_write: ContextVar[Optional["WriteToken"]] = ContextVar("db_write_token", default=None)
+
+
+class WriteToken:
+    """Позиция WAL после записи, выполненной внутри track_writes()"""
+
+    def __init__(self):
+        self.lsn: Optional[str] = None
+
+
+def parse_lsn(value: Optional[str]) -> Optional[str]:
+    """
+    LSN из заголовка клиента; некорректное значение игнорируется.
+    """
+    if value is None or not _LSN_PATTERN.match(value.strip()):
+        return None
+    return value.strip().upper()
+
+
+class Replica:
+    """Реплика для чтения: движок, фабрика сессий и счетчики пула"""
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.session_factory = async_sessionmaker(
+            bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+        self.monitor = PoolMonitor(engine)
+        self.sessions_total = 0
+        self.lagging_total = 0
+        self.errors_total = 0
+
+
+class ReplicaRouter:
+    """
+    Распределение читающих запросов по репликам (по кругу).
+    Отставание реплик ограничивается токеном read-your-writes: пишущий запрос
+    возвращает позицию WAL основной БД, читающий запрос с этим токеном
+    идет на реплику, только если она уже воспроизвела WAL до этой позиции.
+    Иначе, как и при недоступности реплики, запрос обслуживает основная БД.
+    """
+
+    def __init__(self, engines: List[AsyncEngine]):
+        self.replicas = [Replica(engine) for engine in engines]
+        self._cycle = itertools.cycle(self.replicas) if self.replicas else None
+        self.fallbacks_total = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    async def open_session(self, min_lsn: Optional[str] = None) -> Optional[AsyncSession]:
+        """
+        Сессия реплики, догнавшей min_lsn, или None, если читать нужно с основной БД.
+        """
+        if not self.replicas:
+            return None
+        replica = next(self._cycle)
+        db = replica.session_factory()
+        try:
+            await replica.monitor.acquire(db)
+            if min_lsn is not None:
+                # Параметр передается текстом: кодек asyncpg для pg_lsn ждет число
+                caught_up = await db.scalar(
+                    text("SELECT pg_last_wal_replay_lsn() >= CAST(CAST(:lsn AS text) AS pg_lsn)"),
+                    {"lsn": min_lsn}
+                )
+                if not caught_up:
+                    replica.lagging_total += 1
+                    self.fallbacks_total += 1
+                    await db.close()
+                    return None
+        except (ServiceUnavailableException, DBAPIError, OSError) as e:
+            logger.warning("Реплика недоступна, чтение с основной БД: %s", e)
+            replica.errors_total += 1
+            self.fallbacks_total += 1
+            await db.close()
+            return None
+        replica.sessions_total += 1
+        return db
+
+    @staticmethod
+    async def record_write(db: AsyncSession) -> None:
+        """
+        Запоминает позицию WAL основной БД для ответа пишущего запроса.
+        """
+        token = _current_write.get()
+        if token is None:
+            return
+        token.lsn = await db.scalar(text("SELECT CAST(pg_current_wal_lsn() AS text)"))
+        await db.commit()
+
+    def get_stats(self) -> dict:
+        return {
+            "fallbacks_total": self.fallbacks_total,
+            "replicas": [
+                {
+                    **replica.monitor.get_stats(),
+                    "sessions_total": replica.sessions_total,
+                    "lagging_total": replica.lagging_total,
+                    "errors_total": replica.errors_total,
+                }
+                for replica in self.replicas
+            ],
+        }
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+@contextmanager
+def track_writes() -> Iterator[WriteToken]:
+    """
+    Собирает токен read-your-writes текущего запроса.
+    """
+    token = WriteToken()
+    reset = _current_write.set(token)
+    try:
+        yield token
+    finally:
+        _current_write.reset(reset)
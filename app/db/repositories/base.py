@@ -1,7 +1,8 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, Dict, Generic, List, Optional, Sequence, Tuple, Type, TypeVar, Union
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.base import Base
 
@@ -14,39 +15,74 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]):
         self.model = model
 
-    def get(self, db: Session, id: Any) -> Optional[ModelType]:
-        return db.query(self.model).filter(self.model.id == id).first()
+    async def get(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
+        return await db.get(self.model, id)
 
-    def get_list(self, db: Session, skip: int, limit: int, filters: dict = None):
-        query = db.query(self.model).options()
+    async def get_list(self, db: AsyncSession, skip: int, limit: int, filters: dict = None):
+        query = select(self.model)
         if filters is not None:
             for field, value in filters.items():
-                query = query.filter(getattr(self.model, field) == value)
-        return query.offset(skip).limit(limit).all()
+                query = query.where(getattr(self.model, field) == value)
+        # Без ORDER BY порядок строк между страницами не гарантирован
+        query = query.order_by(*self.model.__mapper__.primary_key)
+        result = await db.execute(query.offset(skip).limit(limit))
+        return result.scalars().all()
 
-    def get_list_by_ids(
-        self, db: Session, ids: List[str]
+    async def get_page(
+        self,
+        db: AsyncSession,
+        *,
+        keys: Sequence[Any],
+        after: Optional[Sequence[Any]] = None,
+        limit: int,
+        descending: bool = False
+    ) -> Tuple[List[ModelType], Optional[Tuple[Any, ...]]]:
+        """
+        Keyset-пагинация: строки после значений ключей `after` в порядке `keys`.
+        Ключи должны быть уникальны в совокупности и покрыты индексом,
+        тогда стоимость страницы не зависит от ее номера.
+
+        Returns:
+            Строки страницы и значения ключей для следующей страницы
+            (None, если страница последняя)
+        """
+        query = select(self.model)
+        if after is not None:
+            # Типы ключей нужны для значений из курсора (например, UUID)
+            row, bound = tuple_(*keys), tuple_(*after, types=[key.type for key in keys])
+            query = query.where(row < bound if descending else row > bound)
+        order = [key.desc() if descending else key.asc() for key in keys]
+        result = await db.execute(query.order_by(*order).limit(limit + 1))
+        items = result.scalars().all()
+        if len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        return items, tuple(getattr(items[-1], key.key) for key in keys)
+
+    async def get_list_by_ids(
+        self, db: AsyncSession, ids: List[str]
     ) -> List[ModelType]:
         if not ids:
             return []
-        return db.query(self.model).filter(self.model.id.in_(ids)).all()
+        result = await db.execute(select(self.model).where(self.model.id.in_(ids)))
+        return result.scalars().all()
 
-    def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
+    async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
         try:
             obj_in_data = jsonable_encoder(obj_in)
             db_obj = self.model(**obj_in_data)
             db.add(db_obj)
-            db.commit()
-            db.refresh(db_obj)
+            await db.commit()
+            await db.refresh(db_obj)
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise ValueError(f"Не удалось создать: {str(e)}")
 
         return db_obj
 
-    def update(
+    async def update(
         self,
-        db: Session,
+        db: AsyncSession,
         *,
         db_obj: ModelType,
         obj_in: Union[UpdateSchemaType, Dict[str, Any]]
@@ -60,12 +96,12 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
         return db_obj
 
-    def remove(self, db: Session, *, id: Any) -> ModelType:
-        obj = db.query(self.model).get(id)
-        db.delete(obj)
-        db.commit()
-        return obj 
\ No newline at end of file
+    async def remove(self, db: AsyncSession, *, id: Any) -> ModelType:
+        obj = await db.get(self.model, id)
+        await db.delete(obj)
+        await db.commit()
+        return obj
@@ -0,0 +1,102 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Set
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.blob import Blob, blob_object_name
+
+
+class BlobRepository:
+    """
+    Учет общих объектов хранилища по хешу содержимого.
+    Методы не коммитят: счетчик ссылок меняется в одной транзакции
+    с созданием или удалением записей изображений.
+
+    Запись без ссылок (ref_count = 0) остается, пока воркер очистки не удалит
+    объект: он удаляет объект и запись в одной транзакции под блокировкой строки,
+    а загрузка того же содержимого блокирует ту же строку и ждет его.
+    """
+
+    def __init__(self, model=Blob):
+        self.model = model
+
+    async def add_references(self, db: AsyncSession, *, blobs: List[dict]) -> None:
+        """
+        Добавляет ссылки одним INSERT ... ON CONFLICT для нескольких хешей.
+        Каждый хеш должен встречаться в списке один раз, ref_count - число новых ссылок.
+        С ref_count = 0 запись только отмечает объект для воркера очистки.
+        """
+        if not blobs:
+            return
+        stmt = insert(self.model).values(blobs)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.model.hash],
+            set_={"ref_count": self.model.ref_count + stmt.excluded.ref_count}
+        )
+        await db.execute(stmt)
+
+    async def release(self, db: AsyncSession, *, hashes: List[str]) -> List[str]:
+        """
+        Снимает ссылки. Записи, на которые больше никто не ссылается, остаются
+        с ref_count = 0 до удаления объекта воркером очистки.
+        Записи изображений к этому моменту должны быть уже удалены (flush).
+
+        Returns:
+            Ключи объектов, которые нужно удалить из хранилища
+        """
+        if not hashes:
+            return []
+        released = []
+        for hash, count in Counter(hashes).items():
+            result = await db.execute(
+                update(self.model)
+                .where(self.model.hash == hash)
+                .values(ref_count=self.model.ref_count - count)
+                .returning(self.model.ref_count)
+            )
+            ref_count = result.scalar_one_or_none()
+            if ref_count is not None and ref_count <= 0:
+                released.append(hash)
+        return [blob_object_name(hash) for hash in released]
+
+    async def get_ref_counts_for_update(
+        self, db: AsyncSession, *, hashes: Iterable[str]
+    ) -> Dict[str, int]:
+        """
+        Блокирует записи до конца транзакции и возвращает их счетчики ссылок.
+        Строки блокируются в порядке хешей, как и при загрузке, чтобы избежать взаимоблокировок.
+        """
+        hashes = sorted(set(hashes))
+        if not hashes:
+            return {}
+        result = await db.execute(
+            select(self.model.hash, self.model.ref_count)
+            .where(self.model.hash.in_(hashes))
+            .order_by(self.model.hash)
+            .with_for_update()
+        )
+        return {row.hash: row.ref_count for row in result}
+
+    async def remove_released(self, db: AsyncSession, *, hashes: Iterable[str]) -> None:
+        """
+        Удаляет записи без ссылок после удаления их объектов из хранилища.
+        """
+        hashes = list(hashes)
+        if hashes:
+            await db.execute(
+                delete(self.model)
+                .where(self.model.hash.in_(hashes), self.model.ref_count <= 0)
+            )
+
+    async def get_existing(
+        self, db: AsyncSession, *, hashes: Iterable[str], for_update: bool = False
+    ) -> Set[str]:
+        hashes = list(hashes)
+        if not hashes:
+            return set()
+        stmt = select(self.model.hash).where(self.model.hash.in_(hashes))
+        if for_update:
+            stmt = stmt.order_by(self.model.hash).with_for_update()
+        result = await db.execute(stmt)
+        return set(result.scalars().all())
@@ -0,0 +1,64 @@
+from typing import List, Optional
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.derivative import ImageDerivative
+
+
+class DerivativeRepository:
+    def __init__(self, model=ImageDerivative):
+        self.model = model
+
+    async def get(
+        self, db: AsyncSession, *, source_key: str, size: int, fmt: str
+    ) -> Optional[ImageDerivative]:
+        result = await db.execute(
+            select(self.model).where(
+                self.model.source_key == source_key,
+                self.model.size == size,
+                self.model.format == fmt
+            )
+        )
+        return result.scalar_one_or_none()
+
+    async def create(
+        self,
+        db: AsyncSession,
+        *,
+        source_key: str,
+        size: int,
+        fmt: str,
+        object_name: str,
+        content_type: str,
+        byte_size: int
+    ) -> None:
+        """
+        Записывает производное изображение; повторная запись игнорируется.
+        """
+        stmt = insert(self.model).values(
+            source_key=source_key,
+            size=size,
+            format=fmt,
+            object_name=object_name,
+            content_type=content_type,
+            byte_size=byte_size
+        ).on_conflict_do_nothing(constraint="uq_image_derivatives_source")
+        await db.execute(stmt)
+        await db.commit()
+
+    async def remove_for_sources(self, db: AsyncSession, *, source_keys: List[str]) -> List[str]:
+        """
+        Удаляет записи производных изображений без коммита.
+
+        Returns:
+            Ключи объектов, которые нужно удалить из хранилища
+        """
+        if not source_keys:
+            return []
+        result = await db.execute(
+            delete(self.model)
+            .where(self.model.source_key.in_(source_keys))
+            .returning(self.model.object_name)
+        )
+        return result.scalars().all()
@@ -1,19 +1,39 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.repositories.base import BaseRepository
+from app.models.blob import Blob
 from app.models.image import Image
 from app.schemas.image import ImageCreate
 
 
 class ImageRepository(BaseRepository[Image, ImageCreate, ImageCreate]):
-    def get_by_note(self, db: Session, *, note_id: str) -> List[Image]:
-        return db.query(self.model).filter(self.model.note_id == note_id).all()
+    async def get_by_note(self, db: AsyncSession, *, note_id: str) -> List[Image]:
+        result = await db.execute(select(self.model).where(self.model.note_id == note_id))
+        return result.scalars().all()
 
-    def get_by_id(self, db: Session, *, id: str) -> Optional[Image]:
-        return db.query(self.model).filter(self.model.id == id).first() 
+    async def get_by_id(self, db: AsyncSession, *, id: str) -> Optional[Image]:
+        return await db.get(self.model, id)
+
+    async def get_with_size(
+        self, db: AsyncSession, *, id: str
+    ) -> Optional[Tuple[Image, Optional[int]]]:
+        """
+        Запись изображения и размер его содержимого (None у записей без хеша)
+        """
+        result = await db.execute(
+            select(self.model, Blob.size)
+            .outerjoin(Blob, Blob.hash == self.model.blob_hash)
+            .where(self.model.id == id)
+        )
+        row = result.first()
+        return (row[0], row[1]) if row else None
+    
+    async def get_by_short_url(self, db: AsyncSession, *, short_url: str) -> Optional[Image]:
+        result = await db.execute(
+            select(self.model).where(self.model.short_url == short_url)
+        )
+        return result.scalars().first()
     
-    def get_by_short_url(self, db: Session, *, short_url: str) -> Optional[Image]:
-        return db.query(self.model).filter(self.model.short_url == short_url).first()
     
-    
\ No newline at end of file
@@ -1,56 +1,228 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session, joinedload
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import delete, func, insert, literal, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import noload, selectinload
 from sqlalchemy.exc import SQLAlchemyError
 import uuid
 from datetime import datetime
 
 from app.db.repositories.base import BaseRepository
-from app.models.note import Note
+from app.models.associations import note_tags
+from app.models.note import Note, SEARCH_CONFIG
 from app.models.tag import Tag
-from app.schemas.note import NoteCreate, NoteUpdate
+from app.schemas.note import NoteBulkCreate, NoteCreate, NoteUpdate
+
+
+# Фрагменты с совпадениями для выдачи поиска
+SEARCH_HEADLINE_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxFragments=2, MaxWords=30, MinWords=10"
+
+# Связей note_tags в одном многострочном INSERT (по два параметра на строку)
+LINK_BATCH_SIZE = 5000
 
 
 class NoteRepository(BaseRepository[Note, NoteCreate, NoteUpdate]):
+
+    async def search(
+        self,
+        db: AsyncSession,
+        *,
+        query: str,
+        tags: Sequence[str] = (),
+        after: Optional[Sequence[Any]] = None,
+        limit: int
+    ) -> Tuple[List[Tuple[Note, float, str, str]], Optional[Tuple[float, str]]]:
+        """
+        Полнотекстовый поиск по заголовку и тексту (GIN-индекс search_vector)
+        с keyset-пагинацией по (релевантность, id).
+        Если заданы теги, заметка должна иметь их все.
+
+        Returns:
+            Строки (заметка, релевантность, фрагмент заголовка, фрагмент текста)
+            и значения ключей для следующей страницы
+        """
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        rank = func.ts_rank_cd(Note.search_vector, ts_query)
+        matches = select(Note.id.label("id"), rank.label("rank")).where(
+            Note.search_vector.op("@@")(ts_query)
+        )
+        if tags:
+            tagged = (
+                select(note_tags.c.note_id)
+                .join(Tag, Tag.id == note_tags.c.tag_id)
+                .where(Tag.name.in_(set(tags)))
+                .group_by(note_tags.c.note_id)
+                .having(func.count() == len(set(tags)))
+            )
+            matches = matches.where(Note.id.in_(tagged))
+        if after is not None:
+            matches = matches.where(
+                tuple_(rank, Note.id) < tuple_(*after, types=(rank.type, Note.id.type))
+            )
+        page = (
+            matches.order_by(rank.desc(), Note.id.desc())
+            .limit(limit + 1)
+            .subquery()
+        )
+        # Фрагменты строятся только для строк страницы
+        result = await db.execute(
+            select(
+                Note,
+                page.c.rank,
+                func.ts_headline(SEARCH_CONFIG, Note.title, ts_query, SEARCH_HEADLINE_OPTIONS),
+                func.ts_headline(
+                    SEARCH_CONFIG, func.coalesce(Note.content, ""), ts_query, SEARCH_HEADLINE_OPTIONS
+                ),
+            )
+            .join(page, page.c.id == Note.id)
+            .order_by(page.c.rank.desc(), Note.id.desc())
+        )
+        rows = [tuple(row) for row in result.all()]
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        note, last_rank = rows[-1][0], rows[-1][1]
+        return rows, (last_rank, note.id)
+
+    async def create_many(
+        self,
+        db: AsyncSession,
+        *,
+        notes: List[NoteBulkCreate],
+        tag_ids: List[List[str]]
+    ) -> List[dict]:
+        """
+        Пакетное создание заметок без коммита: многострочные INSERT ... RETURNING
+        для заметок и многострочные INSERT для связей с тегами.
+
+        Args:
+            notes: Заметки
+            tag_ids: ID тегов для каждой заметки, в том же порядке
+
+        Returns:
+            Созданные строки заметок в порядке входных данных
+        """
+        if not notes:
+            return []
+        now = datetime.utcnow()
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "title": note.title,
+                "content": note.content,
+                "created_at": now,
+                "updated_at": now,
+                "version": 1,
+            }
+            for note in notes
+        ]
+        # insertmanyvalues: строки уходят многострочными INSERT, RETURNING в порядке параметров
+        result = await db.execute(
+            insert(Note).returning(
+                Note.id, Note.title, Note.content, Note.created_at, Note.updated_at, Note.version,
+                sort_by_parameter_order=True
+            ),
+            rows
+        )
+        created = [dict(row._mapping) for row in result.all()]
+        links = [
+            {"note_id": row["id"], "tag_id": tag_id}
+            for row, ids in zip(created, tag_ids)
+            for tag_id in dict.fromkeys(ids)
+        ]
+        for start in range(0, len(links), LINK_BATCH_SIZE):
+            await db.execute(insert(note_tags).values(links[start:start + LINK_BATCH_SIZE]))
+        return created
+
+    async def replace_tags(self, db: AsyncSession, *, note_id: str, tag_ids: Iterable[str]) -> None:
+        """
+        Заменяет теги заметки без коммита двумя операторами, разницу считает БД:
+        DELETE снятых тегов и INSERT ... SELECT ... ON CONFLICT DO NOTHING новых.
+        Несуществующие теги пропускаются.
+        """
+        tag_ids = sorted(set(tag_ids))
+        await db.execute(
+            delete(note_tags).where(
+                note_tags.c.note_id == note_id,
+                note_tags.c.tag_id.not_in(tag_ids)
+            )
+        )
+        if tag_ids:
+            await db.execute(
+                pg_insert(note_tags)
+                .from_select(
+                    ["note_id", "tag_id"],
+                    select(literal(note_id, note_tags.c.note_id.type), Tag.id).where(Tag.id.in_(tag_ids)).order_by(Tag.id)
+                )
+                .on_conflict_do_nothing()
+            )
+
+    async def get_with_images(self, db: AsyncSession, *, id: str) -> Optional[Note]:
+        """
+        Получение заметки вместе с изображениями одним запросом
+        (ленивая загрузка связей в AsyncSession недоступна).
+        """
+        return await db.get(self.model, id, options=[selectinload(self.model.images)])
     
-    def update(
+    async def patch(
         self,
-        db: Session,
+        db: AsyncSession,
         *,
-        db_obj: Note,
+        note_id: str,
         obj_in: NoteUpdate,
-        tags: Optional[List[Tag]] = None
-    ) -> Note:
+        tag_ids: Optional[List[str]] = None,
+        expected_versions: Optional[List[int]] = None
+    ) -> Optional[Note]:
         """
-        Обновление заметки с существующими тегами.
+        Обновление заметки одним UPDATE ... RETURNING с увеличением версии.
+        Теги заменяются только после успешного обновления.
         
         Args:
             db: Сессия базы данных
-            db_obj: Объект заметки для обновления
+            note_id: ID заметки
             obj_in: Данные для обновления
-            tags: Список тегов для добавления
+            tag_ids: ID тегов, заменяющих текущие (None - теги не меняются)
+            expected_versions: Версии, которые видел клиент; если текущая
+                не из их числа, изменения не применяются
             
         Returns:
-            Обновленный объект заметки
+            Обновленный объект заметки или None, если заметки с такой версией нет
         """
         try:
-            db_obj.tags = []
-            for t in tags:
-                db_obj.tags.append(t)
-            
-            update_data = obj_in.model_dump(exclude_unset=True, exclude={"tags"})
-            for field, value in update_data.items():
-                setattr(db_obj, field, value)
-            
-            db_obj.version += 1
-            db_obj.updated_at = datetime.now()
-                
-            db.add(db_obj)
-            db.commit()
-            db.refresh(db_obj)
-            return db_obj
+            statement = (
+                update(Note)
+                .where(Note.id == note_id)
+                .values(
+                    **obj_in.model_dump(exclude_unset=True, exclude={"tags"}),
+                    version=Note.version + 1,
+                    updated_at=datetime.utcnow()
+                )
+                .returning(Note)
+            )
+            if expected_versions is not None:
+                statement = statement.where(Note.version.in_(expected_versions))
+            query = select(Note)
+            if tag_ids is not None:
+                # Теги загружаются после замены связей
+                query = query.options(noload(Note.tags))
+            result = await db.execute(
+                query.from_statement(statement).execution_options(populate_existing=True)
+            )
+            note = result.scalars().one_or_none()
+            if note is None:
+                # Заметки нет или версия не совпала: связи не трогаем
+                await db.rollback()
+                return None
+
+            if tag_ids is not None:
+                await self.replace_tags(db, note_id=note_id, tag_ids=tag_ids)
+                # Теги вместе с note_count, измененным триггерами на note_tags
+                result = await db.execute(
+                    select(Note).where(Note.id == note_id).execution_options(populate_existing=True)
+                )
+                note = result.scalars().one()
+            await db.commit()
+            return note
         except SQLAlchemyError as e:
-            db.rollback()
+            await db.rollback()
             raise ValueError(f"Ошибка при обновлении заметки: {str(e)}")
-        except Exception as e:
-            db.rollback()
-            raise ValueError(f"Неожиданная ошибка при обновлении заметки: {str(e)}")
\ No newline at end of file
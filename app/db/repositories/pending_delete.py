@@ -0,0 +1,61 @@
+from typing import List
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.pending_delete import PendingDelete
+
+
+class PendingDeleteRepository:
+    """
+    Очередь удаления объектов хранилища.
+    Записи добавляются в той же транзакции, что и удаление строк в БД,
+    поэтому ни один ключ не теряется при сбое хранилища.
+    """
+
+    def __init__(self, model=PendingDelete):
+        self.model = model
+
+    def enqueue(self, db: AsyncSession, *, object_names: List[str]) -> None:
+        """
+        Добавляет ключи в очередь без коммита.
+        """
+        db.add_all(self.model(object_name=name) for name in object_names)
+
+    async def get_due(self, db: AsyncSession, *, limit: int) -> List[PendingDelete]:
+        """
+        Выбирает записи, срок которых наступил, и блокирует их до конца транзакции.
+        Записи, уже взятые другим воркером, пропускаются (SKIP LOCKED).
+        """
+        result = await db.execute(
+            select(self.model)
+            .where(self.model.next_attempt_at <= datetime.utcnow())
+            .order_by(self.model.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return result.scalars().all()
+
+    async def remove_many(self, db: AsyncSession, *, ids: List[str]) -> None:
+        """
+        Удаляет обработанные записи без коммита.
+        """
+        if ids:
+            await db.execute(delete(self.model).where(self.model.id.in_(ids)))
+
+    async def reschedule(
+        self, db: AsyncSession, *, ids: List[str], error: str, delay: timedelta
+    ) -> None:
+        """
+        Откладывает повторную попытку удаления без коммита.
+        """
+        if ids:
+            await db.execute(
+                update(self.model)
+                .where(self.model.id.in_(ids))
+                .values(
+                    attempts=self.model.attempts + 1,
+                    last_error=error,
+                    next_attempt_at=datetime.utcnow() + delay
+                )
+            )
@@ -1,44 +1,50 @@
-from typing import Optional, List
-from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterable, Optional, List, Sequence
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 import uuid
 
 from app.db.repositories.base import BaseRepository
 from app.models.tag import Tag
 from app.models.note import Note
+from app.models.associations import note_tags
 from app.schemas.tag import TagCreate, TagUpdate
 
+TAG_BATCH_SIZE = 5000
+
 
 class TagRepository(BaseRepository[Tag, TagCreate, TagUpdate]):
     
-    def get_by_name(self, db: Session, tag_name: str) -> Tag:
+    async def get_by_name(self, db: AsyncSession, tag_name: str) -> Tag:
 
-        tag = db.query(Tag).filter(Tag.name == tag_name).first()
+        result = await db.execute(select(Tag).where(Tag.name == tag_name))
+        tag = result.scalars().first()
         if not tag:
             return None
         return tag
 
-    def create(self, db: Session, *, obj_in: TagCreate) -> Tag:
+    async def create(self, db: AsyncSession, *, obj_in: TagCreate) -> Tag:
         db_obj = Tag(
             id=str(uuid.uuid4()),
             name=obj_in.name
         )
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
         return db_obj
     
-    def get_tags_by_note(self, db: Session, note_id: str) -> List[Tag]:
+    async def get_tags_by_note(self, db: AsyncSession, note_id: str) -> List[Tag]:
         """
         Получение всех тегов заметки.
         """
-        note = db.query(Note).filter(Note.id == note_id).first()
+        note = await db.get(Note, note_id)
         if not note:
             return []
         return note.tags
 
-    def add_tags_to_note(
+    async def add_tags_to_note(
         self,
-        db: Session,
+        db: AsyncSession,
         *,
         note_id: str,
         tag_ids: List[str]
@@ -57,26 +63,112 @@ class TagRepository(BaseRepository[Tag, TagCreate, TagUpdate]):
         Raises:
             ValueError: Если заметка не найдена
         """
-        note = db.query(Note).filter(Note.id == note_id).first()
+        note = await db.get(Note, note_id)
         if not note:
             raise ValueError(f"Note with id {note_id} not found")
             
-        # Получаем теги по ID
-        tags = db.query(Tag).filter(Tag.id.in_(tag_ids)).all()
-        
-        # Добавляем только те теги, которых еще нет у заметки
-        for tag in tags:
-            if tag not in note.tags:
-                note.tags.append(tag)
-                
-        db.add(note)
-        db.commit()
-        db.refresh(note)
+        # Одним оператором: существующие теги, которых еще нет у заметки
+        await db.execute(
+            insert(note_tags)
+            .from_select(
+                ["note_id", "tag_id"],
+                select(literal(note_id, note_tags.c.note_id.type), Tag.id).where(Tag.id.in_(tag_ids)).order_by(Tag.id)
+            )
+            .on_conflict_do_nothing()
+        )
+        await db.commit()
+        # note_count изменили триггеры, перечитываем теги и коллекцию заметки
+        tags = await self.reload(db, ids=tag_ids)
+        await db.refresh(note, ["tags"])
         
         return tags
 
-    def get_or_create(self, db: Session, *, name: str) -> Tag:
-        tag = self.get_by_name(db, name=name)
-        if not tag:
-            tag = self.create(db, obj_in=TagCreate(name=name))
-        return tag 
\ No newline at end of file
+    async def get_or_create(self, db: AsyncSession, *, name: str) -> Tag:
+        """
+        Находит или создает тег одним оператором.
+        """
+        tag = (await self.get_or_create_many(db, names=[name]))[name]
+        await db.commit()
+        return tag
+
+    async def reload(self, db: AsyncSession, *, ids: Iterable[str]) -> List[Tag]:
+        """
+        Перечитывает теги, обновляя уже загруженные в сессию объекты
+        (например, после изменения note_count триггерами).
+        """
+        result = await db.execute(
+            select(Tag).where(Tag.id.in_(list(ids))).execution_options(populate_existing=True)
+        )
+        return result.scalars().all()
+
+    async def get_or_create_many(
+        self, db: AsyncSession, *, names: Iterable[str]
+    ) -> Dict[str, Tag]:
+        """
+        Находит или создает теги по именам без коммита:
+        INSERT ... ON CONFLICT (name) DO UPDATE ... RETURNING, один оператор
+        на TAG_BATCH_SIZE имен.
+        DO UPDATE, в отличие от DO NOTHING, возвращает и существующие строки,
+        а при параллельной вставке того же имени дожидается ее вместо
+        ошибки уникальности.
+
+        Returns:
+            Теги по именам
+        """
+        names = sorted(set(names))
+        tags: Dict[str, Tag] = {}
+        # Порциями, чтобы не упереться в лимит параметров одного оператора.
+        # Сортировка задает одинаковый порядок блокировок для параллельных импортов
+        for start in range(0, len(names), TAG_BATCH_SIZE):
+            batch = names[start:start + TAG_BATCH_SIZE]
+            statement = insert(Tag).values(
+                [{"id": str(uuid.uuid4()), "name": name, "note_count": 0} for name in batch]
+            )
+            statement = statement.on_conflict_do_update(
+                index_elements=[Tag.name],
+                set_={"name": statement.excluded.name}
+            ).returning(Tag)
+            result = await db.execute(
+                select(Tag).from_statement(statement).execution_options(populate_existing=True)
+            )
+            tags.update({tag.name: tag for tag in result.scalars().all()})
+        return tags
+
+    async def get_ordered(
+        self,
+        db: AsyncSession,
+        *,
+        keys: Sequence[Any],
+        descending: bool = False,
+        skip: int,
+        limit: int
+    ) -> List[Tag]:
+        """
+        Теги в заданном порядке (по имени или по индексу note_count, id).
+        """
+        order = [key.desc() if descending else key.asc() for key in keys]
+        result = await db.execute(select(Tag).order_by(*order).offset(skip).limit(limit))
+        return result.scalars().all()
+
+    async def recount_note_counts(self, db: AsyncSession) -> int:
+        """
+        Пересчитывает note_count всех тегов одним агрегирующим проходом по note_tags.
+
+        Returns:
+            Количество исправленных тегов
+        """
+        counts = (
+            select(Tag.id.label("id"), func.count(note_tags.c.tag_id).label("n"))
+            .select_from(Tag)
+            .outerjoin(note_tags, note_tags.c.tag_id == Tag.id)
+            .group_by(Tag.id)
+            .subquery()
+        )
+        result = await db.execute(
+            update(Tag)
+            .where(Tag.id == counts.c.id, Tag.note_count != counts.c.n)
+            .values(note_count=counts.c.n)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount
@@ -1,17 +1,34 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
 from app.core.config import get_settings
+from app.db.pool import PoolMonitor
+from app.db.replica import ReplicaRouter
 
 settings = get_settings()
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI), pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _create_engine(uri: str) -> AsyncEngine:
+    return create_async_engine(
+        uri,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING
+    )
 
-def get_db():
-    db = SessionLocal()
-    try:
+
+engine = _create_engine(settings.ASYNC_DATABASE_URI)
+# expire_on_commit=False: после коммита объекты отдаются в ответ без повторных SELECT
+SessionLocal = async_sessionmaker(
+    bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+pool_monitor = PoolMonitor(engine)
+# Реплики для читающих запросов (пустой список - чтение с основной БД)
+replica_router = ReplicaRouter([_create_engine(uri) for uri in settings.ASYNC_REPLICA_URIS])
+
+
+async def get_db():
+    async with SessionLocal() as db:
+        await pool_monitor.acquire(db)
         yield db
-    finally:
-        db.close() 
\ No newline at end of file
@@ -6,8 +6,15 @@ from pydantic import ValidationError
 from app.core.config import get_settings
 from app.api.v1.router import api_router
 from app.db.base import Base
-from app.db.session import engine
+from app.db.replica import LSN_HEADER, track_writes
+from app.db.session import engine, replica_router
+from app.db import query_counter
 from app.storage.minio import storage
+from app.storage.disk_cache import disk_cache
+from app.services.purge import purge_worker
+from app.services.derivative import derivative_generator
+from app.services.reconcile import reconciler
+from app.core.middleware import UploadSizeLimitMiddleware
 from app.core.exceptions import (
     http_exception_handler,
     validation_exception_handler,
@@ -17,8 +24,6 @@ from app.core.exceptions import (
 
 settings = get_settings()
 
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
@@ -30,16 +35,41 @@ app.add_exception_handler(RequestValidationError, validation_exception_handler)
 app.add_exception_handler(ValidationError, pydantic_validation_exception_handler)
 app.add_exception_handler(AppException, http_exception_handler)
 
+app.add_middleware(UploadSizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Браузерный клиент читает версию заметки (If-Match) и токен read-your-writes
+    expose_headers=["ETag", LSN_HEADER],
 )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+if settings.DB_QUERY_COUNT_HEADER:
+    query_counter.install(engine)
+    for replica in replica_router.replicas:
+        query_counter.install(replica.engine)
+
+    @app.middleware("http")
+    async def query_count_header(request: Request, call_next):
+        with query_counter.count_queries() as counter:
+            response = await call_next(request)
+        response.headers["X-DB-Query-Count"] = str(counter.count)
+        return response
+
+if replica_router.enabled:
+    @app.middleware("http")
+    async def replica_write_token_header(request: Request, call_next):
+        """Позиция WAL после записи: клиент передает ее обратно, чтобы читать свои записи"""
+        with track_writes() as token:
+            response = await call_next(request)
+        if token.lsn is not None:
+            response.headers[LSN_HEADER] = token.lsn
+        return response
+
 
 @app.get("/")
 async def root():
@@ -57,4 +87,22 @@ async def root():
 @app.on_event("startup")
 async def startup_event():
     """Инициализация при запуске приложения"""
-    await storage.initialize()
\ No newline at end of file
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await storage.connect()
+    await storage.initialize()
+    disk_cache.initialize()
+    purge_worker.start()
+    derivative_generator.start()
+    reconciler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Освобождение ресурсов при остановке приложения"""
+    await reconciler.stop()
+    derivative_generator.stop()
+    await purge_worker.stop()
+    await storage.close()
+    await engine.dispose()
+    await replica_router.dispose()
@@ -1,11 +1,50 @@
-from sqlalchemy import Column, String, ForeignKey, Table
+from sqlalchemy import Column, ForeignKey, Table, Index, DDL, Uuid, event
 
 from app.db.base import Base
 
-# Таблица связи между заметками и тегами
+# Таблица связи между заметками и тегами.
+# Первичный ключ (note_id, tag_id) исключает дубли и обслуживает выборку тегов заметки,
+# обратный индекс - выборку заметок по тегу
 note_tags = Table(
     'note_tags',
     Base.metadata,
-    Column('note_id', String, ForeignKey('note.id')),
-    Column('tag_id', String, ForeignKey('tag.id'))
-) 
\ No newline at end of file
+    Column('note_id', Uuid(as_uuid=False), ForeignKey('note.id'), primary_key=True),
+    Column('tag_id', Uuid(as_uuid=False), ForeignKey('tag.id'), primary_key=True),
+    Index('ix_note_tags_tag_id_note_id', 'tag_id', 'note_id')
+)
+
+# Счетчик tag.note_count поддерживается триггерами уровня оператора:
+# одно обновление тегов на оператор, сколько бы связей он ни затронул
+NOTE_TAGS_COUNT_FUNCTION = """
+CREATE OR REPLACE FUNCTION note_tags_count() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE tag SET note_count = tag.note_count + delta.n
+        FROM (SELECT tag_id, count(*) AS n FROM new_rows GROUP BY tag_id) AS delta
+        WHERE tag.id = delta.tag_id;
+    ELSE
+        UPDATE tag SET note_count = tag.note_count - delta.n
+        FROM (SELECT tag_id, count(*) AS n FROM old_rows GROUP BY tag_id) AS delta
+        WHERE tag.id = delta.tag_id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+NOTE_TAGS_COUNT_TRIGGERS = (
+    """
+    CREATE TRIGGER note_tags_count_insert AFTER INSERT ON note_tags
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION note_tags_count()
+    """,
+    """
+    CREATE TRIGGER note_tags_count_delete AFTER DELETE ON note_tags
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION note_tags_count()
+    """,
+)
+
+# Для баз, созданных через create_all, а не миграциями
+for statement in (NOTE_TAGS_COUNT_FUNCTION, *NOTE_TAGS_COUNT_TRIGGERS):
+    event.listen(note_tags, "after_create", DDL(statement).execute_if(dialect="postgresql"))
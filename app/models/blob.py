@@ -0,0 +1,30 @@
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Index, text
+from datetime import datetime
+
+from app.db.base import Base
+
+BLOB_PREFIX = "blobs/"
+
+
+def blob_object_name(content_hash: str) -> str:
+    """Ключ объекта в хранилище для содержимого с данным хешем"""
+    return f"{BLOB_PREFIX}{content_hash}"
+
+
+class Blob(Base):
+    """Содержимое изображения, общее для всех записей с одинаковым SHA-256"""
+    __tablename__ = "blobs"
+    __table_args__ = (
+        # Ключи объектов в порядке байтов, как их отдает S3: постраничное чтение при сверке
+        Index("ix_blobs_object_key", text(f"('{BLOB_PREFIX}' || hash) COLLATE \"C\"")).ddl_if(dialect="postgresql"),
+    )
+
+    hash = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String, nullable=False)
+    ref_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    @property
+    def object_name(self) -> str:
+        return blob_object_name(self.hash)
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Index, UniqueConstraint, text
+from datetime import datetime
+import uuid
+
+from app.db.base import Base
+
+
+def derivative_object_name(source_key: str, size: int, fmt: str) -> str:
+    """Ключ производного изображения рядом с оригиналом"""
+    return f"{source_key}.{size}.{fmt}"
+
+
+class ImageDerivative(Base):
+    """Уменьшенная копия объекта хранилища"""
+    __tablename__ = "image_derivatives"
+    __table_args__ = (
+        UniqueConstraint("source_key", "size", "format", name="uq_image_derivatives_source"),
+        # Ключи в порядке байтов (сверка с бакетом)
+        Index("ix_image_derivatives_object_key", text('object_name COLLATE "C"')).ddl_if(dialect="postgresql"),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    # Ключ оригинала в хранилище; общий для всех изображений с одинаковым содержимым
+    source_key = Column(String, nullable=False, index=True)
+    size = Column(Integer, nullable=False)
+    format = Column(String, nullable=False)
+    object_name = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+    byte_size = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
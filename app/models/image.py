@@ -1,21 +1,46 @@
-from sqlalchemy import Column, String, ForeignKey, DateTime
+from sqlalchemy import Column, String, ForeignKey, DateTime, Index, Sequence, Uuid, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
 
 from app.db.base import Base
+from app.models.blob import blob_object_name
+
+# Номера коротких ссылок: каждый nextval резервирует блок из SHORT_URL_BLOCK_SIZE номеров.
+# Размер блока зафиксирован в шаге последовательности, менять только вместе с миграцией
+SHORT_URL_BLOCK_SIZE = 1000
+image_short_url_seq = Sequence(
+    "image_short_url_seq", increment=SHORT_URL_BLOCK_SIZE, metadata=Base.metadata
+)
 
 
 class Image(Base):
     __tablename__ = "images"
+    __table_args__ = (
+        # Ключи старых объектов без общего содержимого в порядке байтов (сверка с бакетом)
+        Index(
+            "ix_images_legacy_object_key",
+            text("(note_id::text || '/' || filename) COLLATE \"C\""),
+            postgresql_where=text("blob_hash IS NULL")
+        ).ddl_if(dialect="postgresql"),
+    )
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(Uuid(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4()))
     filename = Column(String, nullable=False)
-    url = Column(String, nullable=False)
     short_url = Column(String, unique=True, nullable=False)
     content_type = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Связь с заметкой
-    note_id = Column(String, ForeignKey("note.id", ondelete="CASCADE"), nullable=False)
-    note = relationship("Note", back_populates="images") 
\ No newline at end of file
+    note_id = Column(Uuid(as_uuid=False), ForeignKey("note.id", ondelete="CASCADE"), nullable=False, index=True)
+    note = relationship("Note", back_populates="images")
+
+    # Общее содержимое; у старых записей без хеша объект лежит под {note_id}/{filename}
+    blob_hash = Column(String(64), ForeignKey("blobs.hash"), nullable=True, index=True)
+
+    @property
+    def object_name(self) -> str:
+        """Ключ объекта в хранилище"""
+        if self.blob_hash:
+            return blob_object_name(self.blob_hash)
+        return f"{self.note_id}/{self.filename}"
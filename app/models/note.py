@@ -1,20 +1,42 @@
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, DateTime, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Integer, DateTime, Text, Index, Computed, Uuid
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 import uuid
 
 from app.db.base import Base
 from app.models.associations import note_tags
 
+# Конфигурация полнотекстового поиска; запросы должны использовать ту же
+SEARCH_CONFIG = "russian"
+
+
 class Note(Base):
     __tablename__ = "note"
+    # Ключи курсорной пагинации и индекс полнотекстового поиска
+    __table_args__ = (
+        Index("ix_note_created_at_id", "created_at", "id"),
+        Index("ix_note_updated_at_id", "updated_at", "id"),
+        Index("ix_note_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    # Нативный UUID (16 байт); as_uuid=False - в Python и API идентификатор остается строкой
+    id = Column(Uuid(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4()))
     title = Column(String, nullable=False)
     content = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     version = Column(Integer, default=1, nullable=False)
-    # lazy="dynamic"
-    tags = relationship('Tag', secondary=note_tags, back_populates='notes', lazy="dynamic")
+    # Вычисляется самой БД при каждой вставке и обновлении; заголовок весомее текста.
+    # deferred: в Python вектор не нужен и не загружается
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(content, '')), 'B')",
+            persisted=True
+        )
+    ))
+    # selectin: AsyncSession не поддерживает lazy="dynamic" и ленивую загрузку при сериализации
+    tags = relationship('Tag', secondary=note_tags, back_populates='notes', lazy="selectin")
     images = relationship("Image", back_populates="note", cascade="all, delete-orphan") 
\ No newline at end of file
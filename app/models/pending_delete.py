@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, Integer, DateTime, Index, Text, text
+from datetime import datetime
+import uuid
+
+from app.db.base import Base
+
+
+class PendingDelete(Base):
+    """Объект хранилища, ожидающий удаления фоновым воркером"""
+    __tablename__ = "pending_deletes"
+    __table_args__ = (
+        # Ключи в порядке байтов (сверка с бакетом)
+        Index("ix_pending_deletes_object_key", text('object_name COLLATE "C"')).ddl_if(dialect="postgresql"),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    object_name = Column(String, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -1,10 +1,17 @@
-from sqlalchemy import Column, String
+from sqlalchemy import Column, String, Integer, Index, Uuid
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
 from app.models.associations import note_tags
  
 class Tag(Base):
-    id = Column(String, primary_key=True)
+    # Сортировка по популярности
+    __table_args__ = (
+        Index("ix_tag_note_count_id", "note_count", "id"),
+    )
+
+    id = Column(Uuid(as_uuid=False), primary_key=True)
     name = Column(String, unique=True, nullable=False)
-    notes = relationship('Note', secondary=note_tags, back_populates='tags') 
\ No newline at end of file
+    # Число заметок с тегом, поддерживается триггерами на note_tags
+    note_count = Column(Integer, nullable=False, default=0, server_default="0")
+    notes = relationship('Note', secondary=note_tags, back_populates='tags') 
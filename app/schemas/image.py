@@ -1,10 +1,10 @@
 from datetime import datetime
-from pydantic import BaseModel, HttpUrl
+from typing import Optional
+from pydantic import BaseModel
 
 
 class ImageBase(BaseModel):
     filename: str
-    url: HttpUrl
     short_url: str
     content_type: str
 
@@ -23,4 +23,12 @@ class ImageInDB(ImageBase):
 
 
 class Image(ImageInDB):
-    pass 
\ No newline at end of file
+    # Подписанная ссылка на объект в хранилище, в БД не хранится
+    url: Optional[str] = None 
+
+
+class ImageUploadResult(BaseModel):
+    """Результат загрузки одного файла в пакетной загрузке"""
+    filename: Optional[str] = None
+    image: Optional[Image] = None
+    error: Optional[str] = None
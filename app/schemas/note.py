@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Annotated, List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 
@@ -14,6 +14,13 @@ class NoteCreate(NoteBase):
     pass
 
 
+class NoteBulkCreate(NoteCreate):
+    """Заметка в пакетном создании; теги задаются именами"""
+    tags: List[Annotated[str, Field(min_length=1, max_length=50)]] = Field(
+        default_factory=list, max_length=50
+    )
+
+
 class NoteUpdate(BaseModel):
     title: Optional[str] = Field(None, min_length=1, max_length=200)
     content: Optional[str] = Field(None, min_length=1)
@@ -40,4 +47,18 @@ class Note(NoteInDBBase):
 
 
 class NoteInDB(NoteInDBBase):
-    pass 
\ No newline at end of file
+    pass
+
+
+class NoteSearchResult(Note):
+    rank: float
+    # Фрагменты с совпадениями, выделенными <b>...</b>
+    title_highlight: str
+    content_highlight: str
+
+
+class NoteBulkResult(BaseModel):
+    """Результат создания одной заметки в пакетном создании"""
+    index: int
+    note: Optional[Note] = None
+    error: Optional[str] = None
@@ -0,0 +1,10 @@
+from typing import Generic, List, Optional, TypeVar
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+
+class CursorPage(BaseModel, Generic[T]):
+    items: List[T]
+    # None на последней странице
+    next_cursor: Optional[str] = None
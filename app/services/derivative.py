@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.exceptions import ValidationException
+from app.db.repositories.derivative import DerivativeRepository
+from app.db.session import SessionLocal
+from app.models.derivative import derivative_object_name
+from app.storage.minio import storage
+from app.utils.thumbnails import DERIVATIVE_CONTENT_TYPES, render_derivative
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class DerivativeGenerator:
+    """
+    Генерация производных изображений (превью) в пуле процессов.
+    Декодирование и сжатие не занимают ни цикл событий, ни пул потоков.
+    Параллельные запросы одного и того же превью объединяются в одну генерацию.
+    """
+
+    def __init__(self, repository: Optional[DerivativeRepository] = None):
+        self.repository = repository or DerivativeRepository()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[Tuple[str, int, str], asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        if self._executor is None:
+            # fork копировал бы процесс с запущенным циклом событий, потоками
+            # и открытыми соединениями; forkserver запускает чистые процессы,
+            # в которых заранее импортирован только модуль обработки изображений
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["app.utils.thumbnails"])
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_DERIVATIVE_WORKERS,
+                mp_context=context
+            )
+
+    def stop(self) -> None:
+        for task in self._background:
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @staticmethod
+    def validate_size(size: int) -> None:
+        if size not in settings.IMAGE_DERIVATIVE_SIZES:
+            raise ValidationException(
+                f"Недопустимый размер превью {size}, "
+                f"доступны: {', '.join(map(str, settings.IMAGE_DERIVATIVE_SIZES))}"
+            )
+
+    async def get_or_create(self, db: AsyncSession, *, source_key: str, size: int) -> str:
+        """
+        Возвращает ключ превью, при промахе генерирует его.
+        """
+        self.validate_size(size)
+        fmt = settings.IMAGE_DERIVATIVE_FORMAT
+        derivative = await self.repository.get(db, source_key=source_key, size=size, fmt=fmt)
+        if derivative is not None:
+            return derivative.object_name
+        return await self._single_flight(source_key, size, fmt)
+
+    def schedule(self, source_key: str) -> None:
+        """
+        Запускает генерацию всех настроенных размеров в фоне после загрузки.
+        """
+        task = asyncio.create_task(self._generate_defaults(source_key))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _generate_defaults(self, source_key: str) -> None:
+        fmt = settings.IMAGE_DERIVATIVE_FORMAT
+        for size in settings.IMAGE_DERIVATIVE_SIZES:
+            try:
+                # Содержимое могло быть загружено раньше (дедупликация)
+                async with SessionLocal() as db:
+                    existing = await self.repository.get(
+                        db, source_key=source_key, size=size, fmt=fmt
+                    )
+                if existing is None:
+                    await self._single_flight(source_key, size, fmt)
+            except Exception:
+                logger.exception("Не удалось построить превью %s для %s", size, source_key)
+
+    async def _single_flight(self, source_key: str, size: int, fmt: str) -> str:
+        key = (source_key, size, fmt)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._generate(source_key, size, fmt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: отмена одного из ожидающих запросов не прерывает общую генерацию
+        return await asyncio.shield(task)
+
+    async def _generate(self, source_key: str, size: int, fmt: str) -> str:
+        data = await storage.read_file(source_key)
+        loop = asyncio.get_running_loop()
+        try:
+            rendered = await loop.run_in_executor(
+                self._executor,
+                render_derivative,
+                data,
+                size,
+                fmt,
+                settings.IMAGE_DERIVATIVE_QUALITY
+            )
+        except Exception as e:
+            raise ValidationException(f"Не удалось построить превью: {str(e)}")
+        del data
+
+        object_name = derivative_object_name(source_key, size, fmt)
+        content_type = DERIVATIVE_CONTENT_TYPES[fmt]
+        await storage.upload_bytes(rendered, object_name, content_type)
+
+        async with SessionLocal() as db:
+            await self.repository.create(
+                db,
+                source_key=source_key,
+                size=size,
+                fmt=fmt,
+                object_name=object_name,
+                content_type=content_type,
+                byte_size=len(rendered)
+            )
+        return object_name
+
+
+derivative_generator = DerivativeGenerator()
@@ -1,125 +1,464 @@
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from datetime import datetime
 from fastapi import UploadFile
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import hashlib
 import uuid
 
+from app.db.repositories.blob import BlobRepository
+from app.db.repositories.derivative import DerivativeRepository
 from app.db.repositories.image import ImageRepository
 from app.db.repositories.note import NoteRepository
+from app.db.repositories.pending_delete import PendingDeleteRepository
+from app.models.blob import blob_object_name
 from app.models.image import Image
-from app.schemas.image import ImageCreate
+from app.schemas.image import ImageCreate, ImageUploadResult, Image as ImageSchema
 from app.services.base import BaseService
+from app.services.derivative import derivative_generator
+from app.services.purge import purge_worker
+from app.storage.disk_cache import CachedObject, disk_cache
 from app.storage.minio import storage
 from app.utils.url import get_unique_short_url
-from app.core.exceptions import NotFoundException, StorageException, DatabaseException
+from app.core.config import get_settings
+from app.core.exceptions import (
+    AppException,
+    NotFoundException,
+    PayloadTooLargeException,
+    StorageException,
+    DatabaseException,
+    ValidationException
+)
+
+settings = get_settings()
+
+# Сколько раз загружать содержимое, если его объект удаляют параллельно
+BLOB_UPLOAD_ATTEMPTS = 3
 
 
 class ImageService(BaseService[Image, ImageCreate, ImageCreate]):
     def __init__(
         self,
         image_repository: ImageRepository,
-        note_repository: NoteRepository
+        note_repository: NoteRepository,
+        pending_delete_repository: PendingDeleteRepository,
+        blob_repository: BlobRepository,
+        derivative_repository: DerivativeRepository
     ):
         super().__init__(image_repository)
         self.note_repository = note_repository
+        self.pending_delete_repository = pending_delete_repository
+        self.blob_repository = blob_repository
+        self.derivative_repository = derivative_repository
+
+    async def get_object_name(
+        self, db: AsyncSession, image: Image, size: Optional[int] = None
+    ) -> str:
+        """
+        Ключ оригинала или превью заданного размера (генерируется при промахе)
+        """
+        if size is None:
+            return image.object_name
+        return await derivative_generator.get_or_create(
+            db, source_key=image.object_name, size=size
+        )
+
+    async def get_url(
+        self, image: Image, db: Optional[AsyncSession] = None, size: Optional[int] = None
+    ) -> str:
+        """
+        Возвращает подписанную ссылку на изображение (из кэша, если она еще действует)
+        """
+        return await storage.get_presigned_url(
+            await self.get_object_name(db, image, size)
+        )
+
+    async def to_schema(self, image: Image) -> ImageSchema:
+        """
+        Преобразует запись в схему ответа с подписанной ссылкой
+        """
+        return ImageSchema.model_validate(image).model_copy(
+            update={"url": await self.get_url(image)}
+        )
 
     async def upload_image(
-        self, db: Session, *, note_id: str, file: UploadFile
-    ) -> Image:
+        self, db: AsyncSession, *, note_id: str, file: UploadFile
+    ) -> ImageSchema:
         """
-        Загружает изображение в MinIO и создает запись в базе данных
+        Загружает изображение в MinIO и создает запись в базе данных.
+        Файл хешируется и загружается вне транзакции, соединение с БД занято
+        только проверкой заметки и короткой транзакцией создания записей.
         """
-        note = self.note_repository.get(db=db, id=note_id)
+        note = await self.note_repository.get(db=db, id=note_id)
         if not note:
             raise NotFoundException(f"Заметка с id {note_id} не найдена")
+        # Не держим соединение, пока файл хешируется и загружается
+        await db.commit()
 
-        try:
-            # Генерируем уникальное имя файла
-            file_extension = file.filename.split('.')[-1] if file.filename else 'jpg'
-            filename = f"{uuid.uuid4()}.{file_extension}"
-            object_name = f"{note_id}/{filename}"
+        # Генерируем уникальное имя файла
+        file_extension = file.filename.split('.')[-1] if file.filename else 'jpg'
+        filename = f"{uuid.uuid4()}.{file_extension}"
 
-            # Загружаем файл в MinIO
-            try:
-                await storage.upload_file(
-                    file=file,
-                    object_name=object_name
-                )
-            except Exception as e:
-                raise StorageException(f"Не удалось загрузить файл: {str(e)}")
+        # Хешируем содержимое; одинаковые файлы хранятся одним объектом
+        content_hash, size = await self._digest(file)
+        object_name = blob_object_name(content_hash)
+        reference = {
+            "hash": content_hash,
+            "size": size,
+            "content_type": file.content_type,
+            "ref_count": 1
+        }
+        stored = bool(await self._get_stored(db, hashes=[content_hash]))
+
+        uploaded = False
+        for _ in range(BLOB_UPLOAD_ATTEMPTS):
+            # Загружаем файл в MinIO потоково, только если такого содержимого еще нет
+            if not stored:
+                await self._store(file, object_name)
+                uploaded = True
 
-            # Создаем запись в базе данных
+            # Создаем запись в базе данных короткой транзакцией
             try:
-                short_url = await get_unique_short_url()
+                if await self._add_references(db, blobs=[reference]):
+                    # Объект удалили вместе с записью, пока файл загружался
+                    await db.rollback()
+                    stored = False
+                    continue
                 image_in = ImageCreate(
                     filename=filename,
-                    short_url=short_url,
+                    short_url=await get_unique_short_url(db),
                     content_type=file.content_type
                 )
-                
                 db_obj = Image(
                     **image_in.model_dump(),
-                    note_id=note_id
+                    note_id=note_id,
+                    blob_hash=content_hash
                 )
-                
                 db.add(db_obj)
-                db.commit()
-                db.refresh(db_obj)
-                
-                return db_obj
+                await db.commit()
+                await db.refresh(db_obj)
             except Exception as e:
-                # Если не удалось создать запись в БД, удаляем файл из хранилища
-                try:
-                    await storage.delete_file(object_name)
-                except:
-                    pass
+                await db.rollback()
+                # Если объект загрузили мы, отдаем его воркеру очистки.
+                # Воркер не тронет объект, если на него успела сослаться другая загрузка
+                if uploaded:
+                    await self._discard_uploads(db, blobs=[{**reference, "ref_count": 0}])
                 raise DatabaseException(f"Не удалось создать запись в базе данных: {str(e)}")
 
+            derivative_generator.schedule(db_obj.object_name)
+            return await self.to_schema(db_obj)
+
+        await self._discard_uploads(db, blobs=[{**reference, "ref_count": 0}])
+        raise StorageException("Не удалось сохранить файл: объект удаляется параллельно")
+
+    async def upload_images(
+        self, db: AsyncSession, *, note_id: str, files: List[UploadFile]
+    ) -> List[ImageUploadResult]:
+        """
+        Пакетная загрузка изображений в заметку.
+        Файлы хешируются и загружаются в MinIO параллельно (не больше
+        IMAGE_BULK_UPLOAD_CONCURRENCY одновременно) вне транзакции,
+        одинаковое содержимое загружается один раз. Все записи создаются
+        в одной короткой транзакции.
+        Ошибка одного файла не прерывает загрузку остальных.
+        """
+        if len(files) > settings.IMAGE_BULK_UPLOAD_MAX_FILES:
+            raise ValidationException(
+                f"За один запрос можно загрузить не больше {settings.IMAGE_BULK_UPLOAD_MAX_FILES} файлов"
+            )
+        note = await self.note_repository.get(db=db, id=note_id)
+        if not note:
+            raise NotFoundException(f"Заметка с id {note_id} не найдена")
+        # Не держим соединение, пока файлы хешируются и загружаются
+        await db.commit()
+
+        semaphore = asyncio.Semaphore(settings.IMAGE_BULK_UPLOAD_CONCURRENCY)
+        errors: Dict[int, str] = {}
+
+        async def digest(file: UploadFile) -> Tuple[str, int]:
+            async with semaphore:
+                return await self._digest(file)
+
+        async def upload(content_hash: str, file: UploadFile) -> None:
+            async with semaphore:
+                await self._store(file, blob_object_name(content_hash))
+
+        # Хешируем все файлы
+        digests = await asyncio.gather(*(digest(f) for f in files), return_exceptions=True)
+        hashed: Dict[int, Tuple[str, int]] = {}
+        first_file: Dict[str, int] = {}
+        for i, result in enumerate(digests):
+            if isinstance(result, Exception):
+                errors[i] = self._error_message(result)
+            else:
+                hashed[i] = result
+                first_file.setdefault(result[0], i)
+
+        # Загружаем только новое содержимое, по одному разу на хеш
+        stored_hashes = await self._get_stored(db, hashes=first_file)
+        to_upload = [h for h in first_file if h not in stored_hashes]
+        uploaded: Dict[str, dict] = {}
+        for _ in range(BLOB_UPLOAD_ATTEMPTS):
+            uploads = await asyncio.gather(
+                *(upload(h, files[first_file[h]]) for h in to_upload),
+                return_exceptions=True
+            )
+            for content_hash, result in zip(to_upload, uploads):
+                i = first_file[content_hash]
+                if isinstance(result, Exception):
+                    for j, (other_hash, _) in hashed.items():
+                        if other_hash == content_hash:
+                            errors[j] = self._error_message(result)
+                else:
+                    uploaded[content_hash] = {
+                        "hash": content_hash,
+                        "size": hashed[i][1],
+                        "content_type": files[i].content_type,
+                        "ref_count": 0
+                    }
+
+            # Создаем все записи одной короткой транзакцией
+            stored = {i: d for i, d in hashed.items() if i not in errors}
+            references: Dict[str, dict] = {}
+            for i, (content_hash, size) in stored.items():
+                ref = references.setdefault(content_hash, {
+                    "hash": content_hash,
+                    "size": size,
+                    "content_type": files[i].content_type,
+                    "ref_count": 0
+                })
+                ref["ref_count"] += 1
+            try:
+                to_upload = await self._add_references(db, blobs=list(references.values()))
+                if to_upload:
+                    # Объекты удалили вместе с записями, пока файлы загружались
+                    await db.rollback()
+                    continue
+                images: Dict[int, Image] = {}
+                for i, (content_hash, _) in stored.items():
+                    file = files[i]
+                    file_extension = file.filename.split('.')[-1] if file.filename else 'jpg'
+                    image_in = ImageCreate(
+                        filename=f"{uuid.uuid4()}.{file_extension}",
+                        short_url=await get_unique_short_url(db),
+                        content_type=file.content_type
+                    )
+                    images[i] = Image(
+                        **image_in.model_dump(),
+                        note_id=note_id,
+                        blob_hash=content_hash
+                    )
+                db.add_all(images.values())
+                await db.flush()
+                # id и created_at заполнены на стороне Python, повторно читать строки не нужно
+                schemas = {i: ImageSchema.model_validate(image) for i, image in images.items()}
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                await self._discard_uploads(db, blobs=list(uploaded.values()))
+                raise DatabaseException(f"Не удалось создать записи в базе данных: {str(e)}")
+            break
+        else:
+            await self._discard_uploads(db, blobs=list(uploaded.values()))
+            raise StorageException("Не удалось сохранить файлы: объекты удаляются параллельно")
+
+        for content_hash in references:
+            derivative_generator.schedule(blob_object_name(content_hash))
+
+        results = []
+        for i, file in enumerate(files):
+            if i in errors:
+                results.append(ImageUploadResult(filename=file.filename, error=errors[i]))
+                continue
+            schema = schemas[i]
+            url = await storage.get_presigned_url(blob_object_name(stored[i][0]))
+            results.append(ImageUploadResult(
+                filename=file.filename,
+                image=schema.model_copy(update={"url": url})
+            ))
+        return results
+
+    async def _get_stored(self, db: AsyncSession, *, hashes: Iterable[str]) -> Set[str]:
+        """
+        Хеши содержимого, которое уже есть в хранилище. Транзакция сразу завершается.
+        """
+        try:
+            existing = await self.blob_repository.get_existing(db, hashes=hashes)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise DatabaseException(f"Ошибка при проверке содержимого: {str(e)}")
+        return existing
+
+    @staticmethod
+    async def _store(file: UploadFile, object_name: str) -> None:
+        """
+        Потоково загружает файл в хранилище с начала (в том числе повторно).
+        """
+        await file.seek(0)
+        try:
+            await storage.upload_file(
+                file=file,
+                object_name=object_name,
+                max_size=settings.IMAGE_MAX_SIZE
+            )
+        except AppException:
+            raise
         except Exception as e:
-            db.rollback()
-            if isinstance(e, (StorageException, DatabaseException)):
-                raise
-            raise DatabaseException(f"Неожиданная ошибка при загрузке изображения: {str(e)}")
+            raise StorageException(f"Не удалось загрузить файл: {str(e)}")
+
+    async def _add_references(self, db: AsyncSession, *, blobs: List[dict]) -> List[str]:
+        """
+        Добавляет ссылки на содержимое в текущей транзакции.
+        Существующие записи блокируются, и воркер очистки уже не удалит их объекты.
+        Если записи не было, ее объект могли удалить вместе с ней после проверки
+        перед загрузкой: такие объекты проверяются в хранилище.
+
+        Returns:
+            Хеши, содержимое которых нужно загрузить заново
+        """
+        hashes = [blob["hash"] for blob in blobs]
+        existing = await self.blob_repository.get_existing(db, hashes=hashes, for_update=True)
+        await self.blob_repository.add_references(db, blobs=blobs)
+        created = [h for h in hashes if h not in existing]
+        found = await asyncio.gather(*(storage.file_exists(blob_object_name(h)) for h in created))
+        return [h for h, exists in zip(created, found) if not exists]
 
-    def get_by_note(self, db: Session, *, note_id: str) -> List[Image]:
+    async def _discard_uploads(self, db: AsyncSession, *, blobs: List[dict]) -> None:
+        """
+        Отдает загруженные нами объекты воркеру очистки, оставляя записи без ссылок.
+        Ошибка не поднимается: такие объекты найдет сверка хранилища.
         """
-        Получает все изображения для заметки
+        if not blobs:
+            return
+        try:
+            await self.blob_repository.add_references(db, blobs=blobs)
+            self.pending_delete_repository.enqueue(
+                db, object_names=[blob_object_name(blob["hash"]) for blob in blobs]
+            )
+            await db.commit()
+            purge_worker.notify()
+        except Exception:
+            await db.rollback()
+
+    @staticmethod
+    def _error_message(error: Exception) -> str:
+        if isinstance(error, AppException):
+            return str(error.detail)
+        return f"Не удалось загрузить файл: {str(error)}"
+
+    @staticmethod
+    async def _digest(file: UploadFile) -> Tuple[str, int]:
         """
-        return self.repository.get_by_note(db=db, note_id=note_id)
+        Считает SHA-256 и размер загруженного файла, читая его частями,
+        и возвращает курсор в начало для последующей загрузки в хранилище.
 
-    def get_by_short_url(self, db: Session, *, short_url: str) -> Image:
+        Хеш считается отдельным проходом до загрузки, а не по ходу потока:
+        ключ объекта зависит от хеша, и уже сохраненное содержимое не нужно
+        загружать вовсе. Хеширование во время загрузки потребовало бы
+        временного ключа и копирования объекта. Файл к этому моменту уже
+        сохранен Starlette локально, поэтому лишний проход читает диск, а не сеть.
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        while chunk := await file.read(settings.MINIO_MULTIPART_CHUNK_SIZE):
+            size += len(chunk)
+            if size > settings.IMAGE_MAX_SIZE:
+                raise PayloadTooLargeException(
+                    f"Размер файла превышает допустимые {settings.IMAGE_MAX_SIZE} байт"
+                )
+            await run_in_threadpool(hasher.update, chunk)
+        await file.seek(0)
+        return hasher.hexdigest(), size
+
+    async def get_by_note(self, db: AsyncSession, *, note_id: str) -> List[ImageSchema]:
+        """
+        Получает все изображения для заметки с подписанными ссылками
+        """
+        images = await self.repository.get_by_note(db=db, note_id=note_id)
+        return [await self.to_schema(image) for image in images]
+
+    async def get_by_short_url(self, db: AsyncSession, *, short_url: str) -> Image:
         """
         Получает изображение по короткому URL
         """
-        image = self.repository.get_by_short_url(db=db, short_url=short_url)
+        image = await self.repository.get_by_short_url(db=db, short_url=short_url)
         if not image:
             raise NotFoundException(f"Изображение с коротким URL {short_url} не найдено")
         return image
 
-    async def delete_image(self, db: Session, *, image_id: str) -> None:
+    async def open_image(
+        self,
+        db: AsyncSession,
+        *,
+        image_id: str,
+        byte_range: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        if_modified_since: Optional[datetime] = None,
+        size: Optional[int] = None
+    ) -> Tuple[Image, dict]:
         """
-        Удаляет изображение из MinIO и базы данных
+        Открывает объект изображения в хранилище для потоковой отдачи.
+        Если у клиента актуальная копия, второй элемент результата -
+        ответ без тела с NotModified=True (см. storage.get_file).
         """
-        image = self.get(db=db, id=image_id)
+        image = await self.get(db=db, id=image_id)
         if not image:
             raise NotFoundException(f"Изображение с id {image_id} не найдено")
 
-        try:
-            # Удаляем файл из MinIO
-            object_name = f"{image.note_id}/{image.filename}"
-            try:
-                await storage.delete_file(object_name)
-            except Exception as e:
-                raise StorageException(f"Не удалось удалить файл из хранилища: {str(e)}")
+        response = await storage.get_file(
+            await self.get_object_name(db, image, size),
+            byte_range=byte_range,
+            if_none_match=if_none_match,
+            if_modified_since=if_modified_since
+        )
+        return image, response
 
-            # Удаляем запись из базы данных
-            try:
-                db.delete(image)
-                db.commit()
-            except Exception as e:
-                raise DatabaseException(f"Не удалось удалить запись из базы данных: {str(e)}")
+    async def open_cached_image(
+        self, db: AsyncSession, *, image_id: str, size: Optional[int] = None
+    ) -> Tuple[Image, Optional[CachedObject]]:
+        """
+        Возвращает локальную копию изображения из дискового кэша.
+        Второй элемент равен None, если объект слишком велик для кэша.
+        Копия закреплена: после отдачи нужно вызвать disk_cache.release().
+        """
+        found = await self.repository.get_with_size(db=db, id=image_id)
+        if not found:
+            raise NotFoundException(f"Изображение с id {image_id} не найдено")
+        image, blob_size = found
+        cached = await disk_cache.get(
+            await self.get_object_name(db, image, size),
+            # Размер оригинала известен из blobs, превью заранее не измерены
+            expected_size=blob_size if size is None else None
+        )
+        return image, cached
+
+    async def delete_image(self, db: AsyncSession, *, image_id: str) -> None:
+        """
+        Удаляет запись изображения. Объект в MinIO ставится в очередь удаления,
+        только если на его содержимое больше не ссылаются другие изображения
+        """
+        image = await self.get(db=db, id=image_id)
+        if not image:
+            raise NotFoundException(f"Изображение с id {image_id} не найдено")
 
+        try:
+            blob_hash = image.blob_hash
+            object_name = image.object_name
+            await db.delete(image)
+            await db.flush()
+            if blob_hash:
+                object_names = await self.blob_repository.release(db, hashes=[blob_hash])
+            else:
+                object_names = [object_name]
+            object_names += await self.derivative_repository.remove_for_sources(
+                db, source_keys=object_names
+            )
+            self.pending_delete_repository.enqueue(db, object_names=object_names)
+            await db.commit()
         except Exception as e:
-            db.rollback()
-            if isinstance(e, (StorageException, DatabaseException)):
-                raise
-            raise DatabaseException(f"Неожиданная ошибка при удалении изображения: {str(e)}") 
\ No newline at end of file
+            await db.rollback()
+            raise DatabaseException(f"Не удалось удалить запись из базы данных: {str(e)}")
+        if object_names:
+            purge_worker.notify()
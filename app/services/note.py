@@ -1,30 +1,221 @@
 from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 from fastapi import HTTPException
+from pydantic import ValidationError
 
+from app.db.repositories.blob import BlobRepository
+from app.db.repositories.derivative import DerivativeRepository
 from app.db.repositories.note import NoteRepository
 from app.db.repositories.tag import TagRepository
+from app.db.repositories.pending_delete import PendingDeleteRepository
 from app.models.note import Note
-from app.schemas.note import NoteCreate, NoteUpdate, NoteUpdateExternal
+from app.schemas.note import (
+    Note as NoteSchema,
+    NoteBulkCreate,
+    NoteBulkResult,
+    NoteCreate,
+    NoteUpdate,
+    NoteUpdateExternal,
+    NoteSearchResult
+)
+from app.schemas.tag import Tag as TagSchema
+from app.schemas.pagination import CursorPage
 from app.services.base import BaseService
+from app.core.config import get_settings
+from app.core.exceptions import DatabaseException, PreconditionFailedException, ValidationException
+from app.services.purge import purge_worker
+from app.utils.ids import is_uuid
+from app.utils.pagination import (
+    MAX_PAGE_SIZE,
+    decode_cursor,
+    encode_cursor,
+    parse_cursor_datetime,
+    parse_cursor_id
+)
+
+settings = get_settings()
+
+# Поля сортировки для курсорной пагинации, у каждого есть индекс (поле, id)
+NOTE_SORT_KEYS = {
+    "created_at": Note.created_at,
+    "updated_at": Note.updated_at,
+}
 
 
 class NoteService(BaseService[Note, NoteCreate, NoteUpdate]):
     def __init__(
         self,
         note_repository: NoteRepository,
-        tag_repository: TagRepository
+        tag_repository: TagRepository,
+        pending_delete_repository: PendingDeleteRepository,
+        blob_repository: BlobRepository,
+        derivative_repository: DerivativeRepository
     ):
         super().__init__(note_repository)
         self.tag_repository = tag_repository
+        self.pending_delete_repository = pending_delete_repository
+        self.blob_repository = blob_repository
+        self.derivative_repository = derivative_repository
+
+    async def get_page(
+        self,
+        db: AsyncSession,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        sort: str = "created_at"
+    ) -> CursorPage:
+        """
+        Страница заметок от новых к старым по курсору.
+        Пустой курсор - первая страница.
+        """
+        after = None
+        if cursor:
+            value, note_id = decode_cursor(cursor, sort, 2)
+            after = (parse_cursor_datetime(value), parse_cursor_id(note_id))
+        items, last = await self.repository.get_page(
+            db,
+            keys=(NOTE_SORT_KEYS[sort], Note.id),
+            after=after,
+            limit=min(limit, MAX_PAGE_SIZE),
+            descending=True
+        )
+        return CursorPage(
+            items=items,
+            next_cursor=encode_cursor(sort, last) if last else None
+        )
+
+    async def bulk_create(
+        self, db: AsyncSession, *, items: List[Dict[str, Any]]
+    ) -> List[NoteBulkResult]:
+        """
+        Пакетное создание заметок с тегами по именам в одной транзакции.
+        Каждая заметка проверяется отдельно: невалидные пропускаются
+        с ошибкой в результате, остальные создаются.
+        Теги находятся или создаются одним оператором на весь пакет.
+        """
+        if len(items) > settings.NOTE_BULK_CREATE_MAX_ITEMS:
+            raise ValidationException(
+                f"За один запрос можно создать не больше {settings.NOTE_BULK_CREATE_MAX_ITEMS} заметок"
+            )
+        errors: Dict[int, str] = {}
+        notes: Dict[int, NoteBulkCreate] = {}
+        for i, item in enumerate(items):
+            try:
+                notes[i] = NoteBulkCreate.model_validate(item)
+            except ValidationError as e:
+                errors[i] = "; ".join(
+                    f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()
+                )
+
+        try:
+            tags = await self.tag_repository.get_or_create_many(
+                db, names=(name for note in notes.values() for name in note.tags)
+            )
+            created = await self.repository.create_many(
+                db,
+                notes=list(notes.values()),
+                tag_ids=[[tags[name].id for name in note.tags] for note in notes.values()]
+            )
+            # note_count изменили триггеры на note_tags
+            await self.tag_repository.reload(db, ids=[tag.id for tag in tags.values()])
+            tag_schemas = {name: TagSchema.model_validate(tag) for name, tag in tags.items()}
+            await db.commit()
+        except SQLAlchemyError as e:
+            await db.rollback()
+            raise DatabaseException(f"Не удалось создать заметки: {str(e)}")
+
+        rows = dict(zip(notes, created))
+        results = []
+        for i in range(len(items)):
+            if i in errors:
+                results.append(NoteBulkResult(index=i, error=errors[i]))
+                continue
+            note = NoteSchema(
+                **rows[i],
+                tags=[tag_schemas[name] for name in dict.fromkeys(notes[i].tags)]
+            )
+            results.append(NoteBulkResult(index=i, note=note))
+        return results
 
-    def patch(
+    async def search(
         self,
-        db: Session,
+        db: AsyncSession,
+        *,
+        query: str,
+        tags: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+        limit: int = 20
+    ) -> CursorPage:
+        """
+        Полнотекстовый поиск заметок, самые релевантные первыми.
+        Пустой курсор - первая страница.
+        """
+        after = None
+        if cursor:
+            rank, note_id = decode_cursor(cursor, "search", 2)
+            if not isinstance(rank, (int, float)):
+                raise ValidationException("Некорректный курсор пагинации")
+            after = (rank, parse_cursor_id(note_id))
+        rows, last = await self.repository.search(
+            db,
+            query=query,
+            tags=tags or (),
+            after=after,
+            limit=min(limit, MAX_PAGE_SIZE)
+        )
+        items = [
+            NoteSearchResult(
+                **NoteSchema.model_validate(note).model_dump(),
+                rank=rank,
+                title_highlight=title_highlight,
+                content_highlight=content_highlight
+            )
+            for note, rank, title_highlight, content_highlight in rows
+        ]
+        return CursorPage(
+            items=items,
+            next_cursor=encode_cursor("search", last) if last else None
+        )
+
+    async def remove(self, db: AsyncSession, *, id: str) -> Optional[Note]:
+        """
+        Удаление заметки вместе с изображениями.
+        Ссылки на общее содержимое снимаются, а ключи объектов, на которые
+        больше никто не ссылается, вместе с их превью ставятся в очередь удаления
+        в той же транзакции.
+        Сами объекты удаляет фоновый воркер.
+        """
+        note = await self.repository.get_with_images(db=db, id=id)
+        if not note:
+            return None
+        blob_hashes = [image.blob_hash for image in note.images if image.blob_hash]
+        object_names = [image.object_name for image in note.images if not image.blob_hash]
+        try:
+            await db.delete(note)
+            await db.flush()
+            object_names += await self.blob_repository.release(db, hashes=blob_hashes)
+            object_names += await self.derivative_repository.remove_for_sources(
+                db, source_keys=object_names
+            )
+            self.pending_delete_repository.enqueue(db, object_names=object_names)
+            await db.commit()
+        except SQLAlchemyError as e:
+            await db.rollback()
+            raise ValueError(f"Ошибка при удалении заметки: {str(e)}")
+        if object_names:
+            purge_worker.notify()
+        return note
+
+    async def patch(
+        self,
+        db: AsyncSession,
         *,
         note_id: str,
-        obj_in: NoteUpdate
+        obj_in: NoteUpdate,
+        expected_versions: Optional[List[int]] = None
     ) -> Optional[Note]:
         """
         Обновление заметки с тегами и контентом.
@@ -32,28 +223,25 @@ class NoteService(BaseService[Note, NoteCreate, NoteUpdate]):
         - Если тег не существует, он пропускается
         - Если теги не переданы, существующие теги сохраняются
         - Контент и заголовок обновляются, если переданы
+        - Если переданы ожидаемые версии, а текущая версия заметки не из их числа,
+          ничего не меняется и поднимается PreconditionFailedException
         """
-        note = self.repository.get(db=db, id=note_id)
-        if not note:
-            return None
-        
-        updated_note = note
+        tag_ids = None
         if obj_in.tags is not None and len(obj_in.tags) != 0:
-            # если теги предали, то добавляем теги
-            tag_ids = [t["id"] for t in obj_in.tags]
-            tags = self.tag_repository.get_list_by_ids(db=db, ids=tag_ids)
-            updated_note = self.repository.update(
-                db=db,
-                db_obj=note,
-                obj_in=obj_in,
-                tags=tags
-            )
-        else:
-            updated_note = self.repository.update(
-                db=db,
-                db_obj=note,
-                obj_in=obj_in
-            )
-        
-        return updated_note
- 
\ No newline at end of file
+            # если теги предали, то заменяем теги
+            # некорректный идентификатор не может совпасть ни с одним тегом
+            tag_ids = [t["id"] for t in obj_in.tags if is_uuid(t["id"])]
+        note = await self.repository.patch(
+            db=db,
+            note_id=note_id,
+            obj_in=obj_in,
+            tag_ids=tag_ids,
+            expected_versions=expected_versions
+        )
+        if note is None and expected_versions is not None:
+            # Отличаем конфликт версий от отсутствующей заметки
+            if await self.repository.get(db=db, id=note_id) is not None:
+                raise PreconditionFailedException(
+                    f"Заметка изменена, текущая версия не входит в {expected_versions}"
+                )
+        return note
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from app.core.config import get_settings
+from app.db.repositories.blob import BlobRepository
+from app.db.repositories.pending_delete import PendingDeleteRepository
+from app.db.session import SessionLocal
+from app.models.blob import BLOB_PREFIX, blob_object_name
+from app.storage.disk_cache import disk_cache
+from app.storage.minio import storage
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class PurgeWorker:
+    """
+    Фоновый воркер, удаляющий объекты из очереди pending_deletes.
+    Просыпается по сигналу notify() или раз в PURGE_INTERVAL секунд,
+    удаляет ключи пакетами и откладывает неудачные попытки.
+    """
+
+    def __init__(
+        self,
+        repository: Optional[PendingDeleteRepository] = None,
+        blob_repository: Optional[BlobRepository] = None
+    ):
+        self.repository = repository or PendingDeleteRepository()
+        self.blob_repository = blob_repository or BlobRepository()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def notify(self) -> None:
+        """
+        Будит воркер. Можно вызывать из потоков пула синхронных эндпоинтов.
+        """
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                while await self.purge_batch():
+                    pass
+            except Exception:
+                logger.exception("Ошибка при очистке хранилища")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.PURGE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def purge_batch(self) -> int:
+        """
+        Обрабатывает одну порцию очереди.
+
+        Returns:
+            Количество обработанных записей
+        """
+        async with SessionLocal() as db:
+            # Записи порции заблокированы до коммита в конце: другие процессы
+            # приложения берут следующие записи, а не повторяют эти же
+            pending = await self.repository.get_due(db, limit=settings.PURGE_BATCH_SIZE)
+            if not pending:
+                return 0
+            # Общее содержимое могли снова загрузить после постановки в очередь.
+            # Превью (blobs/{hash}.{size}.{fmt}) проверяются по хешу оригинала.
+            # Записи блокируются до удаления объектов и самих записей:
+            # загрузка того же содержимого ждет и затем загружает объект заново
+            blob_hashes = {
+                p.object_name: p.object_name[len(BLOB_PREFIX):].split(".", 1)[0]
+                for p in pending if p.object_name.startswith(BLOB_PREFIX)
+            }
+            ref_counts = await self.blob_repository.get_ref_counts_for_update(
+                db, hashes=blob_hashes.values()
+            )
+            to_delete = [
+                p.object_name for p in pending
+                if self._is_released(p.object_name, blob_hashes.get(p.object_name), ref_counts)
+            ]
+            failed = await storage.delete_files(to_delete) if to_delete else {}
+            for name in to_delete:
+                disk_cache.discard(name)
+            # Запись без ссылок удаляется вместе с объектом; при ошибке остается до повтора
+            failed_hashes = {blob_hashes.get(name) for name in failed}
+            await self.blob_repository.remove_released(db, hashes=[
+                hash for hash, ref_count in ref_counts.items()
+                if ref_count <= 0 and hash not in failed_hashes
+            ])
+            done_ids = [p.id for p in pending if p.object_name not in failed]
+            failed_ids = [p.id for p in pending if p.object_name in failed]
+            await self.repository.remove_many(db, ids=done_ids)
+            if failed_ids:
+                logger.warning("Не удалось удалить %d объектов, повтор позже", len(failed_ids))
+                await self.repository.reschedule(
+                    db,
+                    ids=failed_ids,
+                    error="; ".join(sorted(set(failed.values())))[:1000],
+                    delay=timedelta(seconds=settings.PURGE_RETRY_DELAY)
+                )
+            await db.commit()
+            # Если все ключи порции упали, не крутимся в цикле до следующего сигнала
+            return len(done_ids)
+
+    @staticmethod
+    def _is_released(object_name: str, blob_hash: Optional[str], ref_counts: dict) -> bool:
+        """
+        Можно ли удалить объект: ключ вне blobs/ или содержимое без ссылок.
+        Оригинал без записи не удаляется - его может загружать транзакция,
+        которая еще не закоммитила запись; такой ключ уже удален вместе с записью
+        или остался сиротой, которого найдет сверка.
+        """
+        if blob_hash is None:
+            return True
+        if blob_hash in ref_counts:
+            return ref_counts[blob_hash] <= 0
+        return object_name != blob_object_name(blob_hash)
+
+
+purge_worker = PurgeWorker()
@@ -0,0 +1,365 @@
+import asyncio
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import get_settings
+from app.db.repositories.blob import BlobRepository
+from app.db.repositories.pending_delete import PendingDeleteRepository
+from app.db.session import SessionLocal
+from app.models.blob import BLOB_PREFIX, Blob, blob_object_name
+from app.models.derivative import ImageDerivative
+from app.models.image import Image
+from app.services.purge import purge_worker
+from app.storage.minio import storage
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Следующая страница ключей, на которые ссылается БД, в порядке байтов (как отдает S3),
+# после пары (:key, :kind). Пара уникальна: ключи очереди удаления сгруппированы.
+# Каждая ветка читает не больше страницы (плюс строку на границе прошлой страницы)
+# по своему индексу *_object_key, поэтому стоимость страницы не зависит от ее номера
+EXPECTED_KEYS_QUERY = text(f"""
+    SELECT key, kind, ref, created_at FROM (
+        (SELECT ('{BLOB_PREFIX}' || hash) COLLATE "C" AS key, 'blob' AS kind, hash AS ref, created_at
+         FROM blobs WHERE ('{BLOB_PREFIX}' || hash) COLLATE "C" >= :key
+         ORDER BY 1 LIMIT :limit + 1)
+        UNION ALL
+        (SELECT (note_id::text || '/' || filename) COLLATE "C", 'image', id::text, created_at
+         FROM images WHERE blob_hash IS NULL AND (note_id::text || '/' || filename) COLLATE "C" >= :key
+         ORDER BY 1 LIMIT :limit + 1)
+        UNION ALL
+        (SELECT object_name COLLATE "C", 'derivative', id, created_at
+         FROM image_derivatives WHERE object_name COLLATE "C" >= :key
+         ORDER BY 1 LIMIT :limit + 1)
+        UNION ALL
+        (SELECT object_name COLLATE "C", 'pending', min(id), min(created_at)
+         FROM pending_deletes WHERE object_name COLLATE "C" >= :key
+         GROUP BY 1 ORDER BY 1 LIMIT :limit + 1)
+    ) AS expected
+    WHERE (key, kind) > (:key, :kind)
+    ORDER BY key, kind
+    LIMIT :limit
+""")
+
+# Один проход сверки на весь кластер: сессионная блокировка на отдельном соединении
+RECONCILE_LOCK_KEY = 0x5245434F
+LOCK_QUERY = text("SELECT pg_try_advisory_lock(:key)")
+
+# Ключей из БД на страницу; каждая страница читается отдельной короткой транзакцией
+FETCH_SIZE = 1000
+FIX_BATCH_SIZE = 1000
+# Параллельные HEAD-запросы при повторной проверке кандидатов
+RECHECK_CONCURRENCY = 16
+# Ключ оригинала общего содержимого (превью имеют суффикс .{size}.{fmt})
+BLOB_KEY_PATTERN = re.compile(rf"^{re.escape(BLOB_PREFIX)}([0-9a-f]{{64}})$")
+
+
+class ReconcileLockedError(RuntimeError):
+    """Сверку уже выполняет другой экземпляр приложения"""
+
+
+class ReconcileReport:
+    """Итоги одного прохода сверки"""
+
+    def __init__(self, dry_run: bool):
+        self.dry_run = dry_run
+        self.started_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.objects_scanned = 0
+        self.rows_scanned = 0
+        self.orphan_objects = 0
+        self.orphan_bytes = 0
+        self.dangling_rows = 0
+        self.skipped_recent = 0
+        self.skipped_rechecked = 0
+        self.samples: List[str] = []
+        self._started = time.monotonic()
+        self.elapsed = 0.0
+
+    def finish(self) -> None:
+        self.finished_at = datetime.utcnow()
+        self.elapsed = time.monotonic() - self._started
+
+    def sample(self, message: str) -> None:
+        if len(self.samples) < 100:
+            self.samples.append(message)
+
+    def as_dict(self) -> dict:
+        elapsed = self.elapsed or (time.monotonic() - self._started)
+        return {
+            "dry_run": self.dry_run,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round(elapsed, 3),
+            "objects_scanned": self.objects_scanned,
+            "rows_scanned": self.rows_scanned,
+            "objects_per_second": round(self.objects_scanned / elapsed, 1) if elapsed else 0,
+            "orphan_objects": self.orphan_objects,
+            "orphan_bytes": self.orphan_bytes,
+            "dangling_rows": self.dangling_rows,
+            "skipped_recent": self.skipped_recent,
+            "skipped_rechecked": self.skipped_rechecked,
+            "samples": self.samples,
+        }
+
+
+class Reconciler:
+    """
+    Сверка бакета и БД.
+    Ключи бакета и ключи из БД читаются потоками в одинаковом порядке
+    и сливаются (merge join), поэтому память не зависит от размера бакета.
+
+    - Объект без записи в БД (сирота) ставится в очередь удаления.
+    - Запись без объекта (висячая) удаляется.
+    - Ключи, уже стоящие в очереди удаления, пропускаются.
+
+    Объекты и записи моложе RECONCILE_GRACE_PERIOD не трогаются: их пара
+    может еще создаваться. Перед исправлением каждый кандидат повторно
+    проверяется запросом HEAD, так как списки читались не одновременно.
+    Сирота-оригинал (blobs/{hash}) получает запись без ссылок, и воркер
+    очистки удаляет его, только если на содержимое так и не сослались.
+    """
+
+    def __init__(
+        self,
+        pending_delete_repository: Optional[PendingDeleteRepository] = None,
+        blob_repository: Optional[BlobRepository] = None
+    ):
+        self.pending_delete_repository = pending_delete_repository or PendingDeleteRepository()
+        self.blob_repository = blob_repository or BlobRepository()
+        self.last_report: Optional[ReconcileReport] = None
+        self.running = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None and settings.RECONCILE_INTERVAL:
+            self._task = asyncio.create_task(self._run_periodically())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.RECONCILE_INTERVAL)
+            try:
+                await self.run(dry_run=not settings.RECONCILE_FIX)
+            except ReconcileLockedError:
+                logger.info("Сверка пропущена: ее выполняет другой экземпляр")
+            except Exception:
+                logger.exception("Ошибка при сверке хранилища и БД")
+
+    async def run(self, dry_run: bool = True) -> ReconcileReport:
+        if self.running:
+            raise RuntimeError("Сверка уже выполняется")
+        self.running = True
+        try:
+            async with self._cluster_lock():
+                report = ReconcileReport(dry_run=dry_run)
+                self.last_report = report
+                try:
+                    await self._scan(report)
+                finally:
+                    report.finish()
+        finally:
+            self.running = False
+        logger.info("Сверка хранилища завершена: %s", report.as_dict())
+        return report
+
+    @staticmethod
+    @asynccontextmanager
+    async def _cluster_lock() -> AsyncIterator[None]:
+        """
+        Сессионная advisory-блокировка на отдельном соединении вне пула приложения.
+        Соединение простаивает вне транзакции и не задерживает горизонт очистки (xmin);
+        блокировка снимается закрытием соединения, в том числе при его обрыве.
+        """
+        engine = create_async_engine(settings.ASYNC_DATABASE_URI, poolclass=NullPool)
+        try:
+            async with engine.connect() as conn:
+                locked = await conn.scalar(LOCK_QUERY, {"key": RECONCILE_LOCK_KEY})
+                await conn.commit()
+                if not locked:
+                    raise ReconcileLockedError("Сверка уже выполняется другим экземпляром")
+                yield
+        finally:
+            await engine.dispose()
+
+    async def _scan(self, report: ReconcileReport) -> None:
+        grace_limit = datetime.now(timezone.utc) - timedelta(seconds=settings.RECONCILE_GRACE_PERIOD)
+        # Время в БД хранится в UTC без часового пояса
+        row_grace_limit = grace_limit.replace(tzinfo=None)
+        orphans: List[dict] = []
+        dangling: List[tuple] = []
+        objects = storage.list_files()
+        rows = self._expected_keys()
+        obj = await anext(objects, None)
+        row = await anext(rows, None)
+        matched_key = None
+        while obj is not None or row is not None:
+            if row is not None and row.key == matched_key:
+                # На один объект могут ссылаться несколько строк (например, очередь удаления)
+                row = await anext(rows, None)
+                continue
+            if row is None or (obj is not None and obj["Key"] < row.key):
+                report.objects_scanned += 1
+                if obj["LastModified"] > grace_limit:
+                    report.skipped_recent += 1
+                else:
+                    report.orphan_objects += 1
+                    report.orphan_bytes += obj.get("Size", 0)
+                    report.sample(f"orphan object: {obj['Key']}")
+                    if not report.dry_run:
+                        orphans.append(obj)
+                obj = await anext(objects, None)
+            elif obj is None or row.key < obj["Key"]:
+                report.rows_scanned += 1
+                # Объект из очереди удаления уже удален - это не расхождение
+                if row.kind == "pending":
+                    pass
+                elif row.created_at is not None and row.created_at > row_grace_limit:
+                    report.skipped_recent += 1
+                else:
+                    report.dangling_rows += 1
+                    report.sample(f"dangling {row.kind}: {row.key}")
+                    if not report.dry_run:
+                        dangling.append((row.kind, row.ref, row.key))
+                row = await anext(rows, None)
+            else:
+                report.objects_scanned += 1
+                report.rows_scanned += 1
+                matched_key = row.key
+                obj = await anext(objects, None)
+                row = await anext(rows, None)
+
+            # Исправления применяются порциями, чтобы не копить ключи в памяти
+            if len(orphans) >= FIX_BATCH_SIZE:
+                await self._enqueue_orphans(orphans, grace_limit, report)
+                orphans = []
+            if len(dangling) >= FIX_BATCH_SIZE:
+                await self._remove_dangling(dangling, report)
+                dangling = []
+        if orphans:
+            await self._enqueue_orphans(orphans, grace_limit, report)
+        if dangling:
+            await self._remove_dangling(dangling, report)
+
+    async def _expected_keys(self) -> AsyncIterator:
+        """
+        Ключи из БД страницами по FETCH_SIZE (keyset по ключу и виду записи).
+        Каждая страница читается своей короткой транзакцией: соединение
+        не занято между страницами, и долгий проход не мешает очистке таблиц.
+        """
+        after = {"key": "", "kind": ""}
+        while True:
+            async with SessionLocal() as db:
+                result = await db.execute(EXPECTED_KEYS_QUERY, {**after, "limit": FETCH_SIZE})
+                rows = result.all()
+            for row in rows:
+                yield row
+            if len(rows) < FETCH_SIZE:
+                return
+            after = {"key": rows[-1].key, "kind": rows[-1].kind}
+
+    @staticmethod
+    async def _head_many(object_names: List[str]) -> List[Optional[dict]]:
+        semaphore = asyncio.Semaphore(RECHECK_CONCURRENCY)
+
+        async def head(name: str) -> Optional[dict]:
+            async with semaphore:
+                return await storage.head_file(name)
+
+        return await asyncio.gather(*(head(name) for name in object_names))
+
+    async def _enqueue(self, object_names: List[str]) -> None:
+        async with SessionLocal() as db:
+            self.pending_delete_repository.enqueue(db, object_names=object_names)
+            await db.commit()
+        purge_worker.notify()
+
+    async def _enqueue_orphans(
+        self, objects: List[dict], grace_limit: datetime, report: ReconcileReport
+    ) -> None:
+        """
+        Ставит сирот в очередь удаления, если они все еще есть и не были перезаписаны.
+        """
+        heads = await self._head_many([obj["Key"] for obj in objects])
+        confirmed = []
+        for obj, head in zip(objects, heads):
+            if head is None or head["LastModified"] > grace_limit:
+                report.skipped_rechecked += 1
+            else:
+                confirmed.append(obj)
+        if not confirmed:
+            return
+        blobs = [
+            {
+                "hash": match.group(1),
+                "size": obj.get("Size", 0),
+                "content_type": "application/octet-stream",
+                "ref_count": 0
+            }
+            for obj in confirmed
+            if (match := BLOB_KEY_PATTERN.match(obj["Key"]))
+        ]
+        async with SessionLocal() as db:
+            # Содержимое, на которое успели сослаться, воркер очистки не удалит
+            await self.blob_repository.add_references(db, blobs=blobs)
+            self.pending_delete_repository.enqueue(
+                db, object_names=[obj["Key"] for obj in confirmed]
+            )
+            await db.commit()
+        purge_worker.notify()
+
+    async def _remove_dangling(self, rows: List[tuple], report: ReconcileReport) -> None:
+        """
+        Удаляет записи, объекты которых по-прежнему отсутствуют в хранилище.
+        Изображения общего содержимого удаляются вместе с ним.
+        """
+        heads = await self._head_many([key for _, _, key in rows])
+        ids = {"blob": [], "image": [], "derivative": []}
+        for (kind, ref, _), head in zip(rows, heads):
+            if head is not None:
+                report.skipped_rechecked += 1
+            else:
+                ids[kind].append(ref)
+        if not any(ids.values()):
+            return
+        stale: List[str] = []
+        async with SessionLocal() as db:
+            if ids["derivative"]:
+                await db.execute(delete(ImageDerivative).where(ImageDerivative.id.in_(ids["derivative"])))
+            if ids["image"]:
+                await db.execute(delete(Image).where(Image.id.in_(ids["image"])))
+            if ids["blob"]:
+                await db.execute(delete(Image).where(Image.blob_hash.in_(ids["blob"])))
+                await db.execute(delete(Blob).where(Blob.hash.in_(ids["blob"])))
+                # Превью пропавшего оригинала больше не нужны
+                stale = (await db.execute(
+                    delete(ImageDerivative)
+                    .where(ImageDerivative.source_key.in_(
+                        [blob_object_name(h) for h in ids["blob"]]
+                    ))
+                    .returning(ImageDerivative.object_name)
+                )).scalars().all()
+            await db.commit()
+        if stale:
+            await self._enqueue(stale)
+
+
+reconciler = Reconciler()
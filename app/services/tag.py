@@ -1,24 +1,77 @@
-from typing import Optional
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.repositories.tag import TagRepository
 from app.models.tag import Tag
+from app.schemas.pagination import CursorPage
 from app.schemas.tag import TagCreate, TagUpdate
 from app.services.base import BaseService
+from app.utils.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, parse_cursor_id
+
+# Поля курсорной пагинации и направление сортировки
+TAG_SORT_KEYS = {
+    "name": ((Tag.name,), False),
+    "popularity": ((Tag.note_count, Tag.id), True),
+}
 
 
 class TagService(BaseService[Tag, TagCreate, TagUpdate]):
     def __init__(self, repository: TagRepository):
         super().__init__(repository)
 
-    def get_by_name(self, db: Session, *, tag_name: str) -> Optional[Tag]:
+    async def get_by_name(self, db: AsyncSession, *, tag_name: str) -> Optional[Tag]:
         """
         Получение тега по имени.
         """
-        return self.repository.get_by_name(db=db, tag_name=tag_name)
+        return await self.repository.get_by_name(db=db, tag_name=tag_name)
 
-    def get_or_create(self, db: Session, *, name: str) -> Tag:
+    async def get_or_create(self, db: AsyncSession, *, name: str) -> Tag:
         """
         Получение существующего тега или создание нового.
         """
-        return self.repository.get_or_create(db=db, name=name) 
\ No newline at end of file
+        return await self.repository.get_or_create(db=db, name=name)
+
+    async def get_sorted(
+        self, db: AsyncSession, *, sort: str, skip: int = 0, limit: int = 100
+    ) -> List[Tag]:
+        """
+        Теги по алфавиту или по убыванию популярности.
+        """
+        keys, descending = TAG_SORT_KEYS[sort]
+        return await self.repository.get_ordered(
+            db=db, keys=keys, descending=descending, skip=skip, limit=limit
+        )
+
+    async def get_page(
+        self,
+        db: AsyncSession,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        sort: str = "name"
+    ) -> CursorPage:
+        """
+        Страница тегов по курсору: по алфавиту или по убыванию популярности.
+        Имя тега уникально и проиндексировано, поэтому служит ключом само по себе.
+        """
+        keys, descending = TAG_SORT_KEYS[sort]
+        after = decode_cursor(cursor, sort, len(keys)) if cursor else None
+        if after is not None and keys[-1] is Tag.id:
+            after[-1] = parse_cursor_id(after[-1])
+        items, last = await self.repository.get_page(
+            db,
+            keys=keys,
+            after=after,
+            limit=min(limit, MAX_PAGE_SIZE),
+            descending=descending
+        )
+        return CursorPage(
+            items=items,
+            next_cursor=encode_cursor(sort, last) if last else None
+        )
+
+    async def recount_note_counts(self, db: AsyncSession) -> int:
+        """
+        Восстанавливает счетчики заметок у всех тегов.
+        """
+        return await self.repository.recount_note_counts(db)
@@ -0,0 +1,220 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+import aiofiles
+
+from app.core.config import get_settings
+from app.storage.minio import storage
+
+settings = get_settings()
+
+# Сколько ключей слишком больших объектов помнить, чтобы не запрашивать их повторно
+OVERSIZED_KEYS_LIMIT = 10000
+
+
+class CachedObject:
+    """
+    Объект хранилища, сохраненный на локальном диске.
+    Пока копия закреплена (pins > 0), ее файл не удаляется, даже если запись
+    уже вытеснена из индекса: файл удалит последний release().
+    """
+
+    __slots__ = ("path", "size", "etag", "content_type", "last_modified", "pins", "evicted")
+
+    def __init__(
+        self,
+        path: str,
+        size: int,
+        etag: str,
+        content_type: str,
+        last_modified: Optional[datetime]
+    ):
+        self.path = path
+        self.size = size
+        self.etag = etag
+        self.content_type = content_type
+        self.last_modified = last_modified
+        self.pins = 0
+        self.evicted = False
+
+
+class DiskCache:
+    """
+    Read-through кэш горячих объектов хранилища на локальном диске.
+    Объем ограничен IMAGE_DISK_CACHE_MAX_BYTES, вытесняются давно не читанные
+    объекты (LRU). Параллельные промахи по одному ключу объединяются в одно
+    чтение из хранилища. Индекс хранится в памяти, поэтому при старте
+    каталог очищается.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str],
+        max_bytes: int,
+        max_item_bytes: int
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self._entries: "OrderedDict[str, CachedObject]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Ключи объектов не переиспользуются для другого содержимого,
+        # поэтому слишком большой объект можно больше не запрашивать
+        self._oversized: "OrderedDict[str, None]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.bypassed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def initialize(self) -> None:
+        if not self.enabled:
+            return
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+
+    async def get(
+        self, object_name: str, expected_size: Optional[int] = None
+    ) -> Optional[CachedObject]:
+        """
+        Возвращает локальную копию объекта, при промахе скачивает ее.
+        Для объектов больше IMAGE_DISK_CACHE_MAX_ITEM_BYTES возвращает None,
+        не обращаясь к хранилищу, если размер известен заранее (expected_size)
+        или объект уже встречался.
+        Копия закреплена до вызова release().
+        """
+        if (
+            expected_size is not None and expected_size > self.max_item_bytes
+        ) or object_name in self._oversized:
+            self.bypassed += 1
+            return None
+
+        entry = self._entries.get(object_name)
+        if entry is not None:
+            self._entries.move_to_end(object_name)
+            self.hits += 1
+            return self._pin(entry)
+
+        task = self._inflight.get(object_name)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._fetch(object_name))
+            self._inflight[object_name] = task
+            task.add_done_callback(lambda _: self._inflight.pop(object_name, None))
+        else:
+            self.coalesced += 1
+        entry = await asyncio.shield(task)
+        # Пока ждали загрузку, копию могли вытеснить другие промахи
+        if entry is None or entry.evicted:
+            return None
+        return self._pin(entry)
+
+    def release(self, entry: CachedObject) -> None:
+        """
+        Снимает закрепление копии, полученной из get().
+        """
+        entry.pins -= 1
+        if entry.evicted and entry.pins == 0:
+            self._delete_file(entry)
+
+    def discard(self, object_name: str) -> None:
+        entry = self._entries.pop(object_name, None)
+        if entry is not None:
+            self._remove(entry)
+
+    @staticmethod
+    def _pin(entry: CachedObject) -> CachedObject:
+        entry.pins += 1
+        return entry
+
+    async def _fetch(self, object_name: str) -> Optional[CachedObject]:
+        response = await storage.get_file(object_name)
+        body = response["Body"]
+        try:
+            if response["ContentLength"] > self.max_item_bytes:
+                self.bypassed += 1
+                self._oversized[object_name] = None
+                if len(self._oversized) > OVERSIZED_KEYS_LIMIT:
+                    self._oversized.popitem(last=False)
+                return None
+            # Имя уникально для каждой копии: вытесненная, но еще отдаваемая
+            # копия не пересекается с новой копией того же ключа
+            path = os.path.join(
+                self.directory,
+                f"{hashlib.sha256(object_name.encode()).hexdigest()}.{uuid.uuid4().hex}"
+            )
+            tmp_path = f"{path}.tmp"
+            try:
+                async with aiofiles.open(tmp_path, "wb") as f:
+                    async for chunk in body.iter_chunks(64 * 1024):
+                        await f.write(chunk)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        finally:
+            body.close()
+
+        entry = CachedObject(
+            path=path,
+            size=response["ContentLength"],
+            etag=response["ETag"],
+            content_type=response.get("ContentType") or "application/octet-stream",
+            last_modified=response.get("LastModified")
+        )
+        self._entries[object_name] = entry
+        self.current_bytes += entry.size
+        self._evict()
+        return entry
+
+    def _evict(self) -> None:
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._remove(entry)
+            self.evictions += 1
+
+    def _remove(self, entry: CachedObject) -> None:
+        self.current_bytes -= entry.size
+        entry.evicted = True
+        if entry.pins == 0:
+            self._delete_file(entry)
+
+    @staticmethod
+    def _delete_file(entry: CachedObject) -> None:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "bypassed": self.bypassed,
+            "pinned": sum(1 for entry in self._entries.values() if entry.pins),
+        }
+
+
+disk_cache = DiskCache(
+    directory=settings.IMAGE_DISK_CACHE_DIR,
+    max_bytes=settings.IMAGE_DISK_CACHE_MAX_BYTES,
+    max_item_bytes=settings.IMAGE_DISK_CACHE_MAX_ITEM_BYTES
+)
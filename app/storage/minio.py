@@ -1,20 +1,50 @@
-from typing import Optional, BinaryIO, AsyncGenerator
-from contextlib import asynccontextmanager
+from typing import Optional, AsyncGenerator, AsyncIterator, Dict, List
+from contextlib import asynccontextmanager, AsyncExitStack
 from aiobotocore.session import get_session
+from aiobotocore.config import AioConfig
 from botocore.exceptions import ClientError
-from botocore.client import Config
 from fastapi import UploadFile
-import aiofiles
-import os
-from datetime import datetime, timedelta
-import uuid
-import json
+from datetime import datetime
+from email.utils import parsedate_to_datetime
 
 from app.core.config import get_settings
-from app.core.exceptions import StorageException, NotFoundException
+from app.storage.presigned import PresignedUrlCache
+from app.core.exceptions import (
+    AppException,
+    StorageException,
+    NotFoundException,
+    PayloadTooLargeException,
+    RangeNotSatisfiableException
+)
 
 settings = get_settings()
 
+# Ограничение S3 на число ключей в одном delete_objects
+DELETE_BATCH_SIZE = 1000
+
+
+class TrackedBody:
+    """
+    Тело ответа get_object. Соединение пула остается занятым, пока тело
+    не закрыто, поэтому и счетчик запросов в полете освобождается только в close().
+    """
+
+    def __init__(self, body, on_close):
+        self._body = body
+        self._on_close = on_close
+
+    def __getattr__(self, name):
+        return getattr(self._body, name)
+
+    def close(self) -> None:
+        if self._on_close is None:
+            return
+        on_close, self._on_close = self._on_close, None
+        try:
+            self._body.close()
+        finally:
+            on_close()
+
 
 class MinioStorage:
     def __init__(self):
@@ -23,15 +53,124 @@ class MinioStorage:
             "aws_secret_access_key": settings.MINIO_ROOT_PASSWORD,
             "endpoint_url": f"http://{settings.MINIO_SERVER}:{settings.MINIO_PORT}",
             "region_name": "us-east-1",
-            "config": Config(signature_version='s3v4')
+            "config": AioConfig(
+                signature_version='s3v4',
+                max_pool_connections=settings.MINIO_MAX_POOL_CONNECTIONS,
+                connect_timeout=settings.MINIO_CONNECT_TIMEOUT,
+                read_timeout=settings.MINIO_READ_TIMEOUT,
+                retries={"max_attempts": settings.MINIO_MAX_RETRIES, "mode": "standard"},
+                connector_args={"keepalive_timeout": settings.MINIO_KEEPALIVE_TIMEOUT},
+            )
         }
+        # Подписанные ссылки открывает клиент, поэтому подпись вычисляется
+        # для публичного адреса (хост входит в подпись SigV4)
+        self.signing_config = (
+            {**self.config, "endpoint_url": settings.MINIO_PUBLIC_URL}
+            if settings.MINIO_PUBLIC_URL else None
+        )
         self.bucket_name = settings.MINIO_BUCKET_NAME
         self.session = get_session()
 
+        # Общий клиент, создается один раз при старте приложения
+        self._client = None
+        # Клиент для подписи ссылок публичным адресом (только при MINIO_PUBLIC_URL)
+        self._signing_client = None
+        self._exit_stack: Optional[AsyncExitStack] = None
+
+        self.url_cache = PresignedUrlCache(
+            max_size=settings.MINIO_PRESIGNED_URL_CACHE_SIZE,
+            refresh_margin=settings.MINIO_PRESIGNED_URL_REFRESH_MARGIN
+        )
+
+        # Счетчики нагрузки на пул соединений
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests_total = 0
+        self.saturated_total = 0
+
+    async def connect(self) -> None:
+        """
+        Создает общий S3-клиент с пулом соединений.
+        """
+        if self._client is not None:
+            return
+        self._exit_stack = AsyncExitStack()
+        self._client = await self._exit_stack.enter_async_context(
+            self.session.create_client("s3", **self.config)
+        )
+        if self.signing_config is not None:
+            self._signing_client = await self._exit_stack.enter_async_context(
+                self.session.create_client("s3", **self.signing_config)
+            )
+
+    async def close(self) -> None:
+        """
+        Закрывает общий S3-клиент и его пул соединений.
+        """
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+        self._client = None
+        self._signing_client = None
+        self._exit_stack = None
+
+    def _acquire_slot(self) -> None:
+        self.requests_total += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        if self.in_flight > settings.MINIO_MAX_POOL_CONNECTIONS:
+            # Запрос будет ждать свободное соединение в пуле
+            self.saturated_total += 1
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def create_client(self, track: bool = True) -> AsyncGenerator:
+        """
+        Выдает общий клиент и учитывает запросы в полете.
+        track=False - операция не занимает соединение (подпись ссылок)
+        или учитывается вызывающим кодом.
+        Если общий клиент не создан (скрипты, миграции), создается временный.
+        """
+        if track:
+            self._acquire_slot()
+        try:
+            if self._client is not None:
+                yield self._client
+            else:
+                async with self.session.create_client("s3", **self.config) as client:
+                    yield client
+        finally:
+            if track:
+                self._release_slot()
+
     @asynccontextmanager
-    async def create_client(self) -> AsyncGenerator:
-        async with self.session.create_client("s3", **self.config) as client:
-            yield client
+    async def _create_signing_client(self) -> AsyncGenerator:
+        """
+        Клиент для подписи ссылок: с публичным адресом, если он задан, иначе общий.
+        """
+        if self.signing_config is None:
+            async with self.create_client(track=False) as client:
+                yield client
+        elif self._signing_client is not None:
+            yield self._signing_client
+        else:
+            async with self.session.create_client("s3", **self.signing_config) as client:
+                yield client
+
+    def get_stats(self) -> dict:
+        """
+        Счетчики использования пула соединений.
+        """
+        return {
+            "connected": self._client is not None,
+            "max_pool_connections": settings.MINIO_MAX_POOL_CONNECTIONS,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "requests_total": self.requests_total,
+            "saturated_total": self.saturated_total,
+            "presigned_url_cache": self.url_cache.get_stats(),
+        }
 
     async def _ensure_bucket_exists(self) -> None:
         try:
@@ -49,38 +188,235 @@ class MinioStorage:
     async def initialize(self) -> None:
         await self._ensure_bucket_exists()
 
-    async def upload_file(self, file: UploadFile, object_name: str) -> None:
+    async def upload_file(
+        self, file: UploadFile, object_name: str, max_size: Optional[int] = None
+    ) -> int:
+        """
+        Потоково загружает файл частями фиксированного размера.
+        Небольшие файлы отправляются одним put_object, большие - через multipart upload.
+        В памяти одновременно находится не больше двух частей.
+
+        Returns:
+            Количество загруженных байт
+        """
+        chunk_size = settings.MINIO_MULTIPART_CHUNK_SIZE
+        try:
+            async with self.create_client() as client:
+                first = await self._read_chunk(file, chunk_size, 0, max_size)
+                second = await self._read_chunk(file, chunk_size, len(first), max_size)
+                if not second:
+                    await client.put_object(
+                        Bucket=self.bucket_name,
+                        Key=object_name,
+                        Body=first,
+                        ContentType=file.content_type
+                    )
+                    return len(first)
+                return await self._upload_multipart(
+                    client, file, object_name, [first, second], chunk_size, max_size
+                )
+        except AppException:
+            raise
+        except Exception as e:
+            raise StorageException(f"Не удалось загрузить файл: {str(e)}")
+
+    async def upload_bytes(self, data: bytes, object_name: str, content_type: str) -> None:
+        """
+        Загружает небольшой объект, уже находящийся в памяти.
+        """
         try:
             async with self.create_client() as client:
-                contents = await file.read()
                 await client.put_object(
                     Bucket=self.bucket_name,
                     Key=object_name,
-                    Body=contents,
-                    ContentType=file.content_type
+                    Body=data,
+                    ContentType=content_type
                 )
         except Exception as e:
             raise StorageException(f"Не удалось загрузить файл: {str(e)}")
 
-    async def get_file(self, object_name: str):
+    async def read_file(self, object_name: str) -> bytes:
+        """
+        Читает объект целиком. Только для объектов ограниченного размера.
+        """
+        response = await self.get_file(object_name)
+        body = response["Body"]
+        try:
+            return await body.read()
+        except Exception as e:
+            raise StorageException(f"Не удалось прочитать файл: {str(e)}")
+        finally:
+            body.close()
+
+    async def head_file(self, object_name: str) -> Optional[dict]:
+        """
+        Метаданные объекта (запрос HEAD, без содержимого) или None, если объекта нет.
+        """
         try:
             async with self.create_client() as client:
-                try:
-                    response = await client.get_object(
-                        Bucket=self.bucket_name,
-                        Key=object_name
+                return await client.head_object(Bucket=self.bucket_name, Key=object_name)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise StorageException(f"Ошибка при проверке файла: {str(e)}")
+        except Exception as e:
+            raise StorageException(f"Неожиданная ошибка при проверке файла: {str(e)}")
+
+    async def file_exists(self, object_name: str) -> bool:
+        return await self.head_file(object_name) is not None
+
+    async def _upload_multipart(
+        self,
+        client,
+        file: UploadFile,
+        object_name: str,
+        pending: List[bytes],
+        chunk_size: int,
+        max_size: Optional[int]
+    ) -> int:
+        upload = await client.create_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=object_name,
+            ContentType=file.content_type
+        )
+        upload_id = upload["UploadId"]
+        parts = []
+        total = 0
+        try:
+            chunk = pending.pop(0)
+            while chunk:
+                part_number = len(parts) + 1
+                response = await client.upload_part(
+                    Bucket=self.bucket_name,
+                    Key=object_name,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=chunk
+                )
+                parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+                total += len(chunk)
+                if pending:
+                    chunk = pending.pop(0)
+                else:
+                    chunk = await self._read_chunk(
+                        file, chunk_size, total, max_size
                     )
-                    return response
-                except ClientError as e:
-                    if e.response['Error']['Code'] == 'NoSuchKey':
-                        raise NotFoundException(f"Файл {object_name} не найден")
-                    raise StorageException(f"Ошибка при получении файла: {str(e)}")
+            await client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=object_name,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts}
+            )
+            return total
+        except BaseException:
+            # Незавершенные части занимают место в бакете, поэтому загрузку отменяем
+            try:
+                await client.abort_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=object_name,
+                    UploadId=upload_id
+                )
+            except Exception:
+                pass
+            raise
+
+    @staticmethod
+    async def _read_chunk(
+        file: UploadFile, chunk_size: int, read_so_far: int, max_size: Optional[int]
+    ) -> bytes:
+        chunk = await file.read(chunk_size)
+        if max_size is not None and read_so_far + len(chunk) > max_size:
+            raise PayloadTooLargeException(
+                f"Размер файла превышает допустимые {max_size} байт"
+            )
+        return chunk
+
+    async def get_file(
+        self,
+        object_name: str,
+        byte_range: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        if_modified_since: Optional[datetime] = None
+    ) -> Optional[dict]:
+        """
+        Получает объект из хранилища. Тело ответа (Body) не вычитывается,
+        его нужно читать потоково и закрыть после использования:
+        до закрытия тело занимает соединение пула и учитывается в in_flight.
+        Поэтому нужен общий клиент (connect()): временный клиент закрылся бы
+        раньше, чем будет прочитано тело.
+        Условные заголовки и Range передаются в S3 как есть.
+
+        Returns:
+            Ответ get_object. Если объект не изменился (304), тела нет:
+            NotModified=True и валидаторы объекта ETag и LastModified
+        """
+        params = {"Bucket": self.bucket_name, "Key": object_name}
+        if byte_range:
+            params["Range"] = byte_range
+        if if_none_match:
+            params["IfNoneMatch"] = if_none_match
+        if if_modified_since:
+            params["IfModifiedSince"] = if_modified_since
+        if self._client is None:
+            raise StorageException("Хранилище не подключено: вызовите storage.connect()")
+        self._acquire_slot()
+        try:
+            try:
+                response = await self._client.get_object(**params)
+                response["Body"] = TrackedBody(response["Body"], self._release_slot)
+                return response
+            except ClientError as e:
+                if e.response['ResponseMetadata'].get('HTTPStatusCode') == 304:
+                    self._release_slot()
+                    return self._not_modified(e.response['ResponseMetadata'].get('HTTPHeaders', {}))
+                if e.response['Error']['Code'] == 'NoSuchKey':
+                    raise NotFoundException(f"Файл {object_name} не найден")
+                if e.response['Error']['Code'] == 'InvalidRange':
+                    raise RangeNotSatisfiableException(
+                        f"Недопустимый диапазон {byte_range} для файла {object_name}"
+                    )
+                raise StorageException(f"Ошибка при получении файла: {str(e)}")
         except Exception as e:
-            if isinstance(e, (NotFoundException, StorageException)):
+            self._release_slot()
+            if isinstance(e, AppException):
                 raise
             raise StorageException(f"Неожиданная ошибка при получении файла: {str(e)}")
 
+    @staticmethod
+    def _not_modified(headers: dict) -> dict:
+        """Валидаторы объекта из заголовков ответа 304"""
+        last_modified = None
+        if headers.get("last-modified"):
+            try:
+                last_modified = parsedate_to_datetime(headers["last-modified"])
+            except (TypeError, ValueError):
+                pass
+        return {"NotModified": True, "ETag": headers.get("etag"), "LastModified": last_modified}
+
+    async def get_presigned_url(self, object_name: str) -> str:
+        """
+        Возвращает подписанную GET-ссылку на объект.
+        Подпись вычисляется локально, без запроса к хранилищу, и кэшируется.
+        """
+        url = self.url_cache.get(object_name)
+        if url is not None:
+            return url
+        expires_in = settings.MINIO_PRESIGNED_URL_EXPIRES
+        try:
+            # Подпись вычисляется локально и не занимает соединение пула
+            async with self._create_signing_client() as client:
+                url = await client.generate_presigned_url(
+                    "get_object",
+                    Params={"Bucket": self.bucket_name, "Key": object_name},
+                    ExpiresIn=expires_in
+                )
+        except Exception as e:
+            raise StorageException(f"Не удалось подписать ссылку на файл: {str(e)}")
+        self.url_cache.put(object_name, url, expires_in)
+        return url
+
     async def delete_file(self, object_name: str) -> None:
+        self.url_cache.discard(object_name)
         try:
             async with self.create_client() as client:
                 try:
@@ -97,22 +433,64 @@ class MinioStorage:
                 raise
             raise StorageException(f"Неожиданная ошибка при удалении файла: {str(e)}")
 
-    async def list_files(self, prefix: str = "") -> list:
+    async def delete_files(self, object_names: List[str]) -> Dict[str, str]:
+        """
+        Удаляет объекты пакетами delete_objects (до 1000 ключей на запрос).
 
-        try:
-            async with self.create_client() as client:
+        Returns:
+            Ключи, которые не удалось удалить, с текстом ошибки
+        """
+        failed: Dict[str, str] = {}
+        for name in object_names:
+            self.url_cache.discard(name)
+        async with self.create_client() as client:
+            for start in range(0, len(object_names), DELETE_BATCH_SIZE):
+                batch = object_names[start:start + DELETE_BATCH_SIZE]
                 try:
-                    response = await client.list_objects_v2(
+                    response = await client.delete_objects(
                         Bucket=self.bucket_name,
-                        Prefix=prefix
+                        Delete={
+                            "Objects": [{"Key": name} for name in batch],
+                            "Quiet": True
+                        }
                     )
-                    return response.get('Contents', [])
-                except ClientError as e:
-                    raise StorageException(f"Ошибка при получении списка файлов: {str(e)}")
-        except Exception as e:
-            if isinstance(e, StorageException):
-                raise
-            raise StorageException(f"Неожиданная ошибка при получении списка файлов: {str(e)}")
+                except Exception as e:
+                    failed.update({name: str(e) for name in batch})
+                    continue
+                for error in response.get("Errors", []):
+                    # Отсутствующий ключ уже удален, повторять не нужно
+                    if error.get("Code") != "NoSuchKey":
+                        failed[error["Key"]] = error.get("Message") or error.get("Code", "")
+        return failed
+
+    async def list_files(
+        self,
+        prefix: str = "",
+        page_size: int = 1000,
+        start_after: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Лениво перебирает объекты с префиксом, следуя continuation token.
+        Объекты отдаются в лексикографическом порядке ключей,
+        в памяти держится не больше одной страницы.
+        """
+        params = {"Bucket": self.bucket_name, "Prefix": prefix, "MaxKeys": page_size}
+        if start_after:
+            params["StartAfter"] = start_after
+        while True:
+            try:
+                async with self.create_client() as client:
+                    response = await client.list_objects_v2(**params)
+            except ClientError as e:
+                raise StorageException(f"Ошибка при получении списка файлов: {str(e)}")
+            except Exception as e:
+                raise StorageException(f"Неожиданная ошибка при получении списка файлов: {str(e)}")
+            for obj in response.get('Contents', []):
+                yield obj
+            if not response.get('IsTruncated'):
+                return
+            params["ContinuationToken"] = response["NextContinuationToken"]
+            params.pop("StartAfter", None)
 
 
 storage = MinioStorage() 
\ No newline at end of file
@@ -0,0 +1,50 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class PresignedUrlCache:
+    """
+    LRU-кэш подписанных ссылок по ключу объекта.
+    Ссылка считается устаревшей заранее, за refresh_margin секунд до истечения,
+    чтобы клиент не получил ссылку, которая истечет во время загрузки.
+    """
+
+    def __init__(self, max_size: int, refresh_margin: int):
+        self.max_size = max_size
+        self.refresh_margin = refresh_margin
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            url, expires_at = entry
+            if expires_at - time.monotonic() > self.refresh_margin:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return url
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, url: str, expires_in: int) -> None:
+        self._entries[key] = (url, time.monotonic() + expires_in)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def get_stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,18 @@
+import uuid
+from typing import Any
+
+# Идентификаторы заметок, тегов и изображений - UUID в строковом виде
+UUID_PATTERN = r"^[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}$"
+
+
+def is_uuid(value: Any) -> bool:
+    """
+    Проверяет, что значение можно передать в колонку UUID.
+    """
+    if not isinstance(value, str):
+        return False
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
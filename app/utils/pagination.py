@@ -0,0 +1,48 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Sequence
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.exceptions import ValidationException
+from app.utils.ids import is_uuid
+
+# Верхняя граница размера страницы в режиме курсора
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(sort: str, values: Sequence[Any]) -> str:
+    """
+    Непрозрачный курсор: ключ сортировки и значения последней строки страницы.
+    """
+    payload = json.dumps({"s": sort, "v": jsonable_encoder(list(values))}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, length: int) -> List[Any]:
+    """
+    Разбирает курсор из `length` значений.
+    Курсор другой сортировки считается некорректным.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if payload["s"] != sort or not isinstance(payload["v"], list) or len(payload["v"]) != length:
+            raise ValueError(payload["s"])
+        return payload["v"]
+    except Exception:
+        raise ValidationException("Некорректный курсор пагинации")
+
+
+def parse_cursor_datetime(value: Any) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValidationException("Некорректный курсор пагинации")
+
+
+def parse_cursor_id(value: Any) -> str:
+    if not is_uuid(value):
+        raise ValidationException("Некорректный курсор пагинации")
+    return value
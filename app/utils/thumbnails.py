@@ -0,0 +1,28 @@
+from io import BytesIO
+
+from PIL import Image as PILImage, ImageOps
+
+# Форматы производных изображений и их MIME-типы
+DERIVATIVE_CONTENT_TYPES = {
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+}
+
+
+def render_derivative(data: bytes, size: int, fmt: str, quality: int = 80) -> bytes:
+    """
+    Уменьшает изображение так, чтобы большая сторона была не больше size.
+    Выполняется в пуле процессов, поэтому функция должна оставаться
+    модульной и работать только с байтами.
+    """
+    with PILImage.open(BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail((size, size))
+        if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert("RGBA")
+        output = BytesIO()
+        image.save(output, format=fmt.upper(), quality=quality)
+        return output.getvalue()
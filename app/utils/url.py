@@ -1,36 +1,101 @@
-import base64
+import asyncio
 import hashlib
-from typing import Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.image import Image
+from app.models.image import SHORT_URL_BLOCK_SIZE, image_short_url_seq
 
+BASE62_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+# 62^7 - около 3.5 трлн ссылок длиной 7 символов. Старые ссылки - ровно 8 символов
+# urlsafe base64 от MD5 (иногда с суффиксом "_N", которого нет в base62).
+# Номера за пределами 7 символов кодируются не короче 9 символов,
+# поэтому новые ссылки со старыми не пересекаются
+SHORT_URL_LENGTH = 7
+SHORT_URL_SPACE = len(BASE62_ALPHABET) ** SHORT_URL_LENGTH
+_LEGACY_SHORT_URL_LENGTH = 8
+# Номера перемешиваются перестановкой: соседние ссылки не похожи и не раскрывают
+# число загрузок. Ключ не секретный, но менять его нельзя - ссылки начнут повторяться
+_PERMUTATION_KEY = b"notes-short-url"
+_PERMUTATION_HALF_BITS = 21  # 2^42 > 62^7
+_PERMUTATION_ROUNDS = 4
 
-def generate_short_url(url: str, note_id: str) -> str:
+
+def _feistel(value: int) -> int:
+    """Биекция на [0, 2^42): сеть Фейстеля с раундовой функцией на BLAKE2b"""
+    mask = (1 << _PERMUTATION_HALF_BITS) - 1
+    left, right = value >> _PERMUTATION_HALF_BITS, value & mask
+    for round_number in range(_PERMUTATION_ROUNDS):
+        digest = hashlib.blake2b(
+            right.to_bytes(3, "big"), key=_PERMUTATION_KEY, digest_size=3,
+            salt=round_number.to_bytes(1, "big")
+        ).digest()
+        left, right = right, left ^ (int.from_bytes(digest, "big") & mask)
+    return (left << _PERMUTATION_HALF_BITS) | right
+
+
+def permute_short_url_number(number: int) -> int:
+    """
+    Биекция на [0, 62^7): перестановка на 2^42 повторяется,
+    пока результат не попадет в диапазон (в среднем 1.25 раза).
+    """
+    value = _feistel(number)
+    while value >= SHORT_URL_SPACE:
+        value = _feistel(value)
+    return value
+
+
+def encode_base62(value: int, length: int = 0) -> str:
+    """
+    Кодирует неотрицательное число в base62, дополняя нулями до length символов.
+    """
+    digits = []
+    while value:
+        value, digit = divmod(value, len(BASE62_ALPHABET))
+        digits.append(BASE62_ALPHABET[digit])
+    return "".join(reversed(digits)).rjust(length, BASE62_ALPHABET[0])
+
+
+def encode_short_url(number: int) -> str:
+    """
+    Короткая ссылка для номера из последовательности; разные номера - разные ссылки.
+    """
+    if number < SHORT_URL_SPACE:
+        return encode_base62(permute_short_url_number(number), SHORT_URL_LENGTH)
+    # За пределами 7 символов ссылки длиннее старых (8 символов) и тоже уникальны:
+    # base62 без перестановки, дополнение нулями до 9 символов
+    return encode_base62(number, _LEGACY_SHORT_URL_LENGTH + 1)
+
+
+class ShortUrlAllocator:
     """
-    Генерирует короткий URL для изображения.
-    Использует комбинацию хеша URL и ID заметки для уникальности.
+    Выдача коротких ссылок без проверки занятости в БД.
+    Процесс резервирует блок номеров одним nextval и раздает его из памяти;
+    последовательность не выдает один номер дважды, поэтому ссылки уникальны
+    между процессами. Неиспользованный остаток блока при перезапуске теряется.
     """
-    # Создаем хеш из URL и ID заметки
-    hash_input = f"{url}:{note_id}".encode()
-    hash_object = hashlib.md5(hash_input)
-    # Берем первые 8 символов хеша и кодируем в base64
-    short_hash = base64.urlsafe_b64encode(hash_object.digest()[:6]).decode('ascii')
-    return short_hash
 
+    def __init__(self, block_size: int = SHORT_URL_BLOCK_SIZE):
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
 
-def get_unique_short_url(db: Session, url: str, note_id: str) -> str:
+    async def allocate(self, db: AsyncSession) -> str:
+        async with self._lock:
+            if self._next >= self._end:
+                start = await db.scalar(select(image_short_url_seq.next_value()))
+                self._next, self._end = start, start + self.block_size
+            number = self._next
+            self._next += 1
+        return encode_short_url(number)
+
+
+short_url_allocator = ShortUrlAllocator()
+
+
+async def get_unique_short_url(db: AsyncSession) -> str:
     """
     Генерирует уникальный короткий URL для изображения.
-    Если URL уже существует, добавляет суффикс.
-    """
-    base_short_url = generate_short_url(url, note_id)
-    short_url = base_short_url
-    counter = 1
-    
-    # Проверяем существование URL и добавляем суффикс если нужно
-    while db.query(Image).filter(Image.short_url == short_url).first() is not None:
-        short_url = f"{base_short_url}_{counter}"
-        counter += 1
-    
-    return short_url 
\ No newline at end of file
+    Запрос к БД нужен только раз на SHORT_URL_BLOCK_SIZE ссылок.
+    """
+    return await short_url_allocator.allocate(db)
@@ -0,0 +1,40 @@
+import asyncio
+
+from botocore.exceptions import ClientError
+
+from app.api.v1.endpoints.images import _object_response
+from app.storage.minio import MinioStorage
+
+OBJECT_ETAG = '"5d41402abc4b2a76b9719d911017c592"'
+
+
+class NotModifiedClient:
+    """get_object отвечает 304, как S3 на совпавший If-None-Match"""
+
+    async def get_object(self, **kwargs):
+        raise ClientError(
+            {
+                "Error": {"Code": "304", "Message": "Not Modified"},
+                "ResponseMetadata": {
+                    "HTTPStatusCode": 304,
+                    "HTTPHeaders": {
+                        "etag": OBJECT_ETAG,
+                        "last-modified": "Sun, 18 Oct 2026 10:00:00 GMT",
+                    },
+                },
+            },
+            "GetObject",
+        )
+
+
+def test_not_modified_response_carries_object_validators():
+    storage = MinioStorage()
+    storage._client = NotModifiedClient()
+    obj = asyncio.run(storage.get_file("blobs/key", if_none_match=f'"other", {OBJECT_ETAG}'))
+    assert storage.in_flight == 0
+
+    response = _object_response("image/png", obj)
+    assert response.status_code == 304
+    assert response.headers["etag"] == OBJECT_ETAG
+    assert response.headers["last-modified"] == "Sun, 18 Oct 2026 10:00:00 GMT"
+    assert response.body == b""
@@ -0,0 +1,25 @@
+import pytest
+
+from app.api.v1.endpoints.notes import _parse_if_match
+from app.core.exceptions import BadRequestException
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    ("*", None),
+    (" * ", None),
+    ('"3", *', None),
+    ('"3"', [3]),
+    ('W/"3"', [3]),
+    ("3", [3]),
+    ('"3", "4"', [3, 4]),
+    ('"3",W/"4" , 5', [3, 4, 5]),
+])
+def test_parse_if_match(value, expected):
+    assert _parse_if_match(value) == expected
+
+
+@pytest.mark.parametrize("value", ['"abc"', "W/", '"3", "abc"', '"3",', ""])
+def test_parse_if_match_rejects_malformed_header(value):
+    with pytest.raises(BadRequestException):
+        _parse_if_match(value)
@@ -0,0 +1,80 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.core.config import get_settings
+from app.db.base import Base
+# Импортируем все модели, чтобы create_all создал все таблицы
+from app.models.note import Note  # noqa: F401
+from app.models.tag import Tag  # noqa: F401
+from app.models.image import Image  # noqa: F401
+from app.models.blob import Blob  # noqa: F401
+from app.models.derivative import ImageDerivative  # noqa: F401
+from app.models.pending_delete import PendingDelete  # noqa: F401
+from app.models.associations import note_tags  # noqa: F401
+
+
+@pytest.fixture(scope="session")
+def postgres():
+    """Пропускает тест, если Postgres (настройки POSTGRES_*) недоступен"""
+    async def ping():
+        engine = create_async_engine(get_settings().ASYNC_DATABASE_URI)
+        try:
+            async with engine.connect():
+                pass
+        finally:
+            await engine.dispose()
+
+    try:
+        asyncio.run(asyncio.wait_for(ping(), timeout=3))
+    except Exception as e:
+        pytest.skip(f"Postgres недоступен: {e}")
+
+
+class PgSchema:
+    """
+    Отдельная схема со всеми таблицами приложения. Изменения в ней коммитятся,
+    поэтому ее видят несколько соединений сразу (тесты блокировок).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def engine(self, **kwargs) -> AsyncEngine:
+        """Движок, у соединений которого схема первая в search_path"""
+        return create_async_engine(
+            get_settings().ASYNC_DATABASE_URI,
+            connect_args={"server_settings": {"search_path": self.name}},
+            **kwargs
+        )
+
+
+@pytest.fixture
+def pg_schema(postgres):
+    schema = PgSchema(f"test_{uuid.uuid4().hex[:12]}")
+
+    async def create():
+        engine = schema.engine()
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"CREATE SCHEMA {schema.name}"))
+                await conn.run_sync(Base.metadata.create_all)
+        finally:
+            await engine.dispose()
+
+    async def drop():
+        engine = create_async_engine(get_settings().ASYNC_DATABASE_URI)
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema.name} CASCADE"))
+        finally:
+            await engine.dispose()
+
+    asyncio.run(create())
+    try:
+        yield schema
+    finally:
+        asyncio.run(drop())
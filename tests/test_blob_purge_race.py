@@ -0,0 +1,122 @@
+"""
+Гонка дедупликации и очистки на настоящем Postgres (настройки POSTGRES_*),
+в отдельной схеме. Воркер очистки и загрузка того же содержимого блокируют
+одну строку blobs: объект либо удаляется до новой ссылки и загружается
+заново, либо остается. Без доступной БД тесты пропускаются.
+"""
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.repositories.blob import BlobRepository
+from app.db.repositories.derivative import DerivativeRepository
+from app.db.repositories.image import ImageRepository
+from app.db.repositories.note import NoteRepository
+from app.db.repositories.pending_delete import PendingDeleteRepository
+from app.models.blob import Blob, blob_object_name
+from app.models.image import Image
+from app.models.note import Note
+from app.services import image as image_module
+from app.services import purge as purge_module
+from app.services.image import ImageService
+from app.services.purge import PurgeWorker
+
+HASH = "ab" * 32
+KEY = blob_object_name(HASH)
+REFERENCE = {"hash": HASH, "size": 3, "content_type": "image/png", "ref_count": 1}
+
+
+class FakeStorage:
+    """Объекты в памяти; удаление можно задержать, пока не открыт gate"""
+
+    def __init__(self):
+        self.objects = {KEY}
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.deleting = asyncio.Event()
+
+    async def file_exists(self, object_name: str) -> bool:
+        return object_name in self.objects
+
+    async def delete_files(self, object_names):
+        self.deleting.set()
+        await self.gate.wait()
+        self.objects.difference_update(object_names)
+        return {}
+
+
+def _service() -> ImageService:
+    return ImageService(
+        ImageRepository(Image), NoteRepository(Note), PendingDeleteRepository(),
+        BlobRepository(), DerivativeRepository()
+    )
+
+
+async def _setup(pg_schema, monkeypatch):
+    engine = pg_schema.engine()
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    storage = FakeStorage()
+    monkeypatch.setattr(purge_module, "SessionLocal", session_factory)
+    monkeypatch.setattr(purge_module, "storage", storage)
+    monkeypatch.setattr(image_module, "storage", storage)
+    # Содержимое без ссылок, его объект стоит в очереди удаления
+    async with session_factory() as db:
+        await BlobRepository().add_references(db, blobs=[{**REFERENCE, "ref_count": 0}])
+        PendingDeleteRepository().enqueue(db, object_names=[KEY])
+        await db.commit()
+    return engine, session_factory, storage
+
+
+async def _ref_count(session_factory):
+    async with session_factory() as db:
+        return await db.scalar(select(Blob.ref_count).where(Blob.hash == HASH))
+
+
+def test_upload_waits_for_purge_and_reuploads(pg_schema, monkeypatch):
+    async def run():
+        engine, session_factory, storage = await _setup(pg_schema, monkeypatch)
+        try:
+            storage.gate.clear()
+            purge = asyncio.create_task(PurgeWorker().purge_batch())
+            await storage.deleting.wait()
+
+            async with session_factory() as db:
+                # Воркер держит строку, пока удаляет объект: загрузка ждет
+                upload = asyncio.create_task(_service()._add_references(db, blobs=[REFERENCE]))
+                await asyncio.sleep(0.3)
+                assert not upload.done()
+
+                storage.gate.set()
+                assert await purge == 1
+                # Объект удален вместе с записью - загрузка должна повторить PUT
+                assert await upload == [HASH]
+                await db.rollback()
+            assert KEY not in storage.objects
+            assert await _ref_count(session_factory) is None
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_purge_keeps_object_referenced_again(pg_schema, monkeypatch):
+    async def run():
+        engine, session_factory, storage = await _setup(pg_schema, monkeypatch)
+        try:
+            async with session_factory() as db:
+                # Загрузка первой блокирует строку и ссылается на содержимое
+                assert await _service()._add_references(db, blobs=[REFERENCE]) == []
+                purge = asyncio.create_task(PurgeWorker().purge_batch())
+                await asyncio.sleep(0.3)
+                assert not purge.done()
+                await db.commit()
+
+            # Запись из очереди снята, объект остался
+            assert await purge == 1
+            assert KEY in storage.objects
+            assert await _ref_count(session_factory) == 1
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
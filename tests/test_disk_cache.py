@@ -0,0 +1,108 @@
+import asyncio
+import os
+
+import pytest
+
+from app.storage import disk_cache as disk_cache_module
+from app.storage.disk_cache import DiskCache
+
+
+class FakeBody:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def iter_chunks(self, chunk_size: int):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+    def close(self) -> None:
+        pass
+
+
+class FakeStorage:
+    """Объекты вида "{имя}-{размер}" заполнены нулями"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def get_file(self, object_name: str) -> dict:
+        self.requests.append(object_name)
+        await asyncio.sleep(0)
+        data = b"\0" * int(object_name.rsplit("-", 1)[1])
+        return {"Body": FakeBody(data), "ContentLength": len(data), "ETag": '"etag"'}
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    fake = FakeStorage()
+    monkeypatch.setattr(disk_cache_module, "storage", fake)
+    return fake
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=100, max_item_bytes=60)
+    cache.initialize()
+    return cache
+
+
+def get(cache: DiskCache, object_name: str, **kwargs):
+    entry = asyncio.run(cache.get(object_name, **kwargs))
+    if entry is not None:
+        cache.release(entry)
+    return entry
+
+
+def test_hit_does_not_touch_storage(cache, storage):
+    first = get(cache, "a-10")
+    second = get(cache, "a-10")
+    assert second is first
+    assert storage.requests == ["a-10"]
+    with open(first.path, "rb") as f:
+        assert len(f.read()) == 10
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted(cache, storage):
+    a = get(cache, "a-40")
+    get(cache, "b-40")
+    get(cache, "a-40")
+    get(cache, "c-40")
+    assert cache.current_bytes == 80
+    assert "b-40" not in cache._entries
+    assert a.path and os.path.exists(a.path)
+    assert cache.evictions == 1
+
+
+def test_pinned_file_survives_eviction_until_released(cache, storage):
+    async def scenario():
+        a = await cache.get("a-60")
+        b = await cache.get("b-60")
+        cache.release(b)
+        assert a.evicted and os.path.exists(a.path)
+        cache.release(a)
+        assert not os.path.exists(a.path)
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_misses_are_coalesced(cache, storage):
+    async def scenario():
+        entries = await asyncio.gather(*(cache.get("a-10") for _ in range(5)))
+        for entry in entries:
+            cache.release(entry)
+        return entries
+
+    entries = asyncio.run(scenario())
+    assert all(entry is entries[0] for entry in entries)
+    assert storage.requests == ["a-10"]
+    assert cache.coalesced == 4
+
+
+def test_oversized_objects_bypass_cache(cache, storage):
+    assert get(cache, "big-70") is None
+    assert get(cache, "big-70") is None
+    assert get(cache, "other-70", expected_size=70) is None
+    assert storage.requests == ["big-70"]
+    assert cache.bypassed == 3
+    assert cache.current_bytes == 0
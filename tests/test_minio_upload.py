@@ -0,0 +1,102 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from app.core.exceptions import PayloadTooLargeException, StorageException
+from app.storage import minio as minio_module
+from app.storage.minio import MinioStorage
+
+CHUNK = 4
+
+
+class FakeS3Client:
+    """Записывает вызовы; upload_part с номером fail_part падает"""
+
+    def __init__(self, fail_part=None, error=ConnectionError("connection reset")):
+        self.fail_part = fail_part
+        self.error = error
+        self.calls = []
+
+    async def put_object(self, **kwargs):
+        self.calls.append(("put_object", kwargs["Body"]))
+
+    async def create_multipart_upload(self, **kwargs):
+        self.calls.append(("create_multipart_upload", kwargs["Key"]))
+        return {"UploadId": "upload-1"}
+
+    async def upload_part(self, **kwargs):
+        if kwargs["PartNumber"] == self.fail_part:
+            raise self.error
+        self.calls.append(("upload_part", kwargs["Body"]))
+        return {"ETag": f'"{kwargs["PartNumber"]}"'}
+
+    async def complete_multipart_upload(self, **kwargs):
+        self.calls.append(("complete_multipart_upload", len(kwargs["MultipartUpload"]["Parts"])))
+
+    async def abort_multipart_upload(self, **kwargs):
+        self.calls.append(("abort_multipart_upload", kwargs["UploadId"]))
+
+    def names(self):
+        return [name for name, _ in self.calls]
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(minio_module.settings, "MINIO_MULTIPART_CHUNK_SIZE", CHUNK)
+
+
+def upload(client: FakeS3Client, data: bytes, max_size=None) -> int:
+    storage = MinioStorage()
+    storage._client = client
+    file = UploadFile(io.BytesIO(data), headers=Headers({"content-type": "image/png"}))
+    try:
+        return asyncio.run(storage.upload_file(file, "blobs/key", max_size=max_size))
+    finally:
+        assert storage.in_flight == 0
+
+
+def test_small_file_is_sent_with_put_object():
+    client = FakeS3Client()
+    assert upload(client, b"abc") == 3
+    assert client.calls == [("put_object", b"abc")]
+
+
+def test_large_file_is_uploaded_in_parts():
+    client = FakeS3Client()
+    assert upload(client, b"0123456789") == 10
+    assert client.calls == [
+        ("create_multipart_upload", "blobs/key"),
+        ("upload_part", b"0123"),
+        ("upload_part", b"4567"),
+        ("upload_part", b"89"),
+        ("complete_multipart_upload", 3),
+    ]
+
+
+def test_failed_part_aborts_upload():
+    client = FakeS3Client(fail_part=2)
+    with pytest.raises(StorageException):
+        upload(client, b"0123456789")
+    assert client.names() == ["create_multipart_upload", "upload_part", "abort_multipart_upload"]
+
+
+def test_oversized_stream_aborts_upload():
+    # Лимит превышен на третьей части, когда две уже отправлены
+    client = FakeS3Client()
+    with pytest.raises(PayloadTooLargeException):
+        upload(client, b"0123456789", max_size=9)
+    assert client.names() == [
+        "create_multipart_upload", "upload_part", "upload_part", "abort_multipart_upload"
+    ]
+    assert "complete_multipart_upload" not in client.names()
+
+
+def test_cancelled_upload_is_aborted():
+    # Клиент оборвал запрос: задача отменяется посреди загрузки части
+    client = FakeS3Client(fail_part=2, error=asyncio.CancelledError())
+    with pytest.raises(asyncio.CancelledError):
+        upload(client, b"0123456789")
+    assert client.names()[-1] == "abort_multipart_upload"
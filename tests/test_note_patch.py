@@ -0,0 +1,42 @@
+"""
+Условное обновление заметки (If-Match) на настоящем Postgres (настройки POSTGRES_*),
+в отдельной схеме. Без доступной БД тесты пропускаются.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.repositories.note import NoteRepository
+from app.models.note import Note
+from app.schemas.note import NoteUpdate
+
+
+def test_patch_applies_only_when_current_version_is_expected(pg_schema):
+    async def run():
+        engine = pg_schema.engine()
+        session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            note = Note(title="note", content="text")
+            async with session_factory() as db:
+                db.add(note)
+                await db.commit()
+
+            repository = NoteRepository(Note)
+            async with session_factory() as db:
+                stale = await repository.patch(
+                    db, note_id=note.id, obj_in=NoteUpdate(title="stale"), expected_versions=[2, 3]
+                )
+                assert stale is None
+
+                patched = await repository.patch(
+                    db, note_id=note.id, obj_in=NoteUpdate(title="new"), expected_versions=[1, 2]
+                )
+                assert patched.title == "new"
+                assert patched.version == 2
+                # Время обновления в UTC, как и created_at
+                assert abs(patched.updated_at - datetime.utcnow()) < timedelta(minutes=1)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import pytest
+
+from app.core.exceptions import ValidationException
+from app.utils.pagination import (
+    decode_cursor,
+    encode_cursor,
+    parse_cursor_datetime,
+    parse_cursor_id,
+)
+
+NOTE_ID = "3f2b8c1e-9d4a-4e6b-8f0a-1c2d3e4f5a6b"
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 2, 20, 12, 0, 0, 123456)
+    cursor = encode_cursor("created_at", [created_at, NOTE_ID])
+    assert "=" not in cursor
+    value, note_id = decode_cursor(cursor, "created_at", 2)
+    assert parse_cursor_datetime(value) == created_at
+    assert parse_cursor_id(note_id) == NOTE_ID
+
+
+def test_cursor_of_other_sort_is_rejected():
+    cursor = encode_cursor("created_at", ["2024-02-20T12:00:00", NOTE_ID])
+    with pytest.raises(ValidationException):
+        decode_cursor(cursor, "updated_at", 2)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", encode_cursor("created_at", [1])])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValidationException):
+        decode_cursor(cursor, "created_at", 2)
+
+
+def test_cursor_values_are_validated():
+    with pytest.raises(ValidationException):
+        parse_cursor_datetime("yesterday")
+    with pytest.raises(ValidationException):
+        parse_cursor_id("1; DROP TABLE note")
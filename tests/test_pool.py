@@ -0,0 +1,55 @@
+"""
+Исчерпание пула соединений на настоящем Postgres (настройки POSTGRES_*):
+запрос, не дождавшийся соединения за DB_POOL_TIMEOUT, получает 503 с Retry-After.
+Без доступной БД тесты пропускаются.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from starlette.requests import Request
+
+from app.api import deps
+from app.core.config import get_settings
+from app.core.exceptions import ServiceUnavailableException, http_exception_handler
+from app.db.pool import PoolMonitor
+
+
+def _request(method: str = "GET") -> Request:
+    return Request({"type": "http", "method": method, "path": "/", "headers": []})
+
+
+def test_exhausted_pool_answers_503(postgres, monkeypatch):
+    async def run():
+        engine = create_async_engine(
+            get_settings().ASYNC_DATABASE_URI, pool_size=1, max_overflow=0, pool_timeout=0.2
+        )
+        monitor = PoolMonitor(engine)
+        monkeypatch.setattr(deps, "SessionLocal", async_sessionmaker(bind=engine, class_=AsyncSession))
+        monkeypatch.setattr(deps, "pool_monitor", monitor)
+        try:
+            # Единственное соединение пула занято первым запросом
+            holder = deps.get_db(_request())
+            await anext(holder)
+            waiter = deps.get_db(_request())
+            with pytest.raises(ServiceUnavailableException) as error:
+                await anext(waiter)
+            await holder.aclose()
+
+            stats = monitor.get_stats()
+            assert (stats["checkouts_total"], stats["timeouts_total"]) == (1, 1)
+            assert stats["waiting"] == 0
+            assert stats["checked_out"] == 0
+
+            # После освобождения соединение снова выдается
+            session = deps.get_db(_request())
+            await anext(session)
+            await session.aclose()
+            assert monitor.get_stats()["checkouts_total"] == 2
+            return await http_exception_handler(_request(), error.value)
+        finally:
+            await engine.dispose()
+
+    response = asyncio.run(run())
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(get_settings().DB_POOL_RETRY_AFTER)
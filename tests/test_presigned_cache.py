@@ -0,0 +1,42 @@
+import pytest
+
+from app.storage import presigned
+from app.storage.presigned import PresignedUrlCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(presigned.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_url_is_cached_until_refresh_margin(clock):
+    cache = PresignedUrlCache(max_size=10, refresh_margin=60)
+    cache.put("a", "url-a", expires_in=3600)
+    clock[0] += 3600 - 61
+    assert cache.get("a") == "url-a"
+    clock[0] += 1
+    assert cache.get("a") is None
+    assert cache.get_stats()["size"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_url_is_evicted(clock):
+    cache = PresignedUrlCache(max_size=2, refresh_margin=60)
+    cache.put("a", "url-a", expires_in=3600)
+    cache.put("b", "url-b", expires_in=3600)
+    assert cache.get("a") == "url-a"
+    cache.put("c", "url-c", expires_in=3600)
+    assert cache.get("b") is None
+    assert cache.get("a") == "url-a"
+    assert cache.get("c") == "url-c"
+    assert cache.evictions == 1
+
+
+def test_discard_removes_url(clock):
+    cache = PresignedUrlCache(max_size=2, refresh_margin=60)
+    cache.put("a", "url-a", expires_in=3600)
+    cache.discard("a")
+    cache.discard("missing")
+    assert cache.get("a") is None
@@ -0,0 +1,89 @@
+"""
+Очередь удаления на настоящем Postgres (настройки POSTGRES_*), в отдельной
+схеме: повтор неудачных удалений и разбор порций несколькими воркерами.
+Без доступной БД тесты пропускаются.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.repositories.pending_delete import PendingDeleteRepository
+from app.models.pending_delete import PendingDelete
+from app.services import purge as purge_module
+from app.services.purge import PurgeWorker
+
+
+class FakeStorage:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.deleted = []
+
+    async def delete_files(self, object_names):
+        self.deleted.extend(object_names)
+        return {name: "connection reset" for name in object_names if name in self.failing}
+
+
+async def _add_pending(session_factory, names):
+    async with session_factory() as db:
+        PendingDeleteRepository().enqueue(db, object_names=names)
+        await db.commit()
+
+
+async def _pending(session_factory):
+    async with session_factory() as db:
+        result = await db.execute(select(PendingDelete).order_by(PendingDelete.object_name))
+        return result.scalars().all()
+
+
+def test_failed_delete_is_retried_later(pg_schema, monkeypatch):
+    storage = FakeStorage(failing={"note/b.jpg"})
+    monkeypatch.setattr(purge_module, "storage", storage)
+    monkeypatch.setattr(purge_module.settings, "PURGE_RETRY_DELAY", 60)
+
+    async def run():
+        engine = pg_schema.engine()
+        session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        monkeypatch.setattr(purge_module, "SessionLocal", session_factory)
+        worker = PurgeWorker()
+        try:
+            await _add_pending(session_factory, ["note/a.jpg", "note/b.jpg"])
+            assert await worker.purge_batch() == 1
+            [row] = await _pending(session_factory)
+            assert row.object_name == "note/b.jpg"
+            assert row.attempts == 1
+            assert row.last_error == "connection reset"
+            assert row.next_attempt_at > datetime.utcnow() + timedelta(seconds=50)
+
+            # До срока повтора запись не берется
+            assert await worker.purge_batch() == 0
+            assert storage.deleted == ["note/a.jpg", "note/b.jpg"]
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_workers_claim_disjoint_rows(pg_schema):
+    async def run():
+        engine = pg_schema.engine()
+        session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        repository = PendingDeleteRepository()
+        try:
+            await _add_pending(session_factory, [f"note/{i}.jpg" for i in range(4)])
+            async with session_factory() as first, session_factory() as second:
+                claimed = await repository.get_due(first, limit=3)
+                # Второй воркер не ждет блокировок первого и берет оставшееся
+                rest = await asyncio.wait_for(repository.get_due(second, limit=3), timeout=5)
+                assert len(claimed) == 3
+                assert len(rest) == 1
+                assert not {p.id for p in claimed} & {p.id for p in rest}
+
+                await first.rollback()
+                # После отката записи первого воркера снова доступны, запись второго занята
+                assert len(await repository.get_due(first, limit=10)) == 3
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
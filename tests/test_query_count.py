@@ -0,0 +1,62 @@
+"""
+Число запросов страницы заметок на настоящем Postgres (настройки POSTGRES_*).
+Без доступной БД тесты пропускаются. Таблицы создаются в транзакции,
+которая откатывается в конце теста.
+"""
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.config import get_settings
+from app.db import query_counter
+from app.db.base import Base
+from app.db.repositories.blob import BlobRepository
+from app.db.repositories.derivative import DerivativeRepository
+from app.db.repositories.note import NoteRepository
+from app.db.repositories.pending_delete import PendingDeleteRepository
+from app.db.repositories.tag import TagRepository
+from app.models.note import Note
+from app.models.tag import Tag
+from app.services.note import NoteService
+
+
+async def _page_queries(limit: int) -> int:
+    engine = create_async_engine(get_settings().ASYNC_DATABASE_URI)
+    query_counter.install(engine)
+    try:
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            try:
+                await conn.run_sync(Base.metadata.create_all)
+                db = AsyncSession(
+                    bind=conn, expire_on_commit=False,
+                    join_transaction_mode="create_savepoint"
+                )
+                tags = [Tag(id=str(uuid.uuid4()), name=f"query-count-{uuid.uuid4()}") for _ in range(4)]
+                db.add_all(
+                    Note(title=f"note {i}", content="text", tags=tags[i % 3:i % 3 + 2])
+                    for i in range(limit + 5)
+                )
+                await db.flush()
+                db.expunge_all()
+
+                service = NoteService(
+                    NoteRepository(Note), TagRepository(Tag), PendingDeleteRepository(),
+                    BlobRepository(), DerivativeRepository()
+                )
+                with query_counter.assert_max_queries(2) as counter:
+                    page = await service.get_page(db, cursor="", limit=limit)
+                assert len(page.items) == limit
+                return counter.count
+            finally:
+                await transaction.rollback()
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.parametrize("limit", [5, 50])
+def test_note_page_costs_two_statements(postgres, limit):
+    # Страница и теги всех ее заметок (selectin) - независимо от размера страницы
+    assert asyncio.run(_page_queries(limit)) <= 2
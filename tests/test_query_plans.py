@@ -0,0 +1,79 @@
+"""
+Планы основных запросов на настоящем Postgres (настройки POSTGRES_*):
+соединения заметок с тегами, изображения заметки и страница заметок
+должны идти по индексам. Без доступной БД тесты пропускаются.
+Таблицы создаются в транзакции, которая откатывается в конце теста;
+enable_seqscan отключен, чтобы на пустых таблицах планировщик
+выбирал индекс, если он вообще подходит запросу.
+"""
+import asyncio
+import json
+import uuid
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import get_settings
+from app.db.base import Base
+from app.models.associations import note_tags
+from app.models.image import Image
+from app.models.note import Note
+from app.services.reconcile import EXPECTED_KEYS_QUERY
+
+NOTE_ID = str(uuid.uuid4())
+TAG_ID = str(uuid.uuid4())
+
+QUERIES = {
+    # Заметки по тегу (фильтр тегов поиска)
+    "ix_note_tags_tag_id_note_id": select(note_tags.c.note_id).where(note_tags.c.tag_id == TAG_ID),
+    # Теги страницы заметок (selectin-загрузка Note.tags)
+    "note_tags_pkey": select(note_tags.c.tag_id).where(note_tags.c.note_id.in_([NOTE_ID])),
+    # Изображения заметки
+    "ix_images_note_id": select(Image).where(Image.note_id == NOTE_ID),
+    # Страница заметок, новые первыми
+    "ix_note_created_at_id": select(Note).order_by(Note.created_at.desc(), Note.id.desc()).limit(21),
+}
+
+
+def _index_names(plan: dict) -> set:
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", ()):
+        names |= _index_names(child)
+    return names
+
+
+async def _plan_indexes(query) -> set:
+    sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    engine = create_async_engine(get_settings().ASYNC_DATABASE_URI)
+    try:
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            try:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.execute(text("SET LOCAL enable_seqscan = off"))
+                plan = await conn.scalar(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return _index_names(plan[0]["Plan"])
+            finally:
+                await transaction.rollback()
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.parametrize("index", list(QUERIES))
+def test_query_uses_index(postgres, index):
+    assert index in asyncio.run(_plan_indexes(QUERIES[index]))
+
+
+def test_reconcile_page_uses_object_key_indexes(postgres):
+    # Каждая ветка страницы ключей читается по своему индексу, а не целиком
+    query = EXPECTED_KEYS_QUERY.bindparams(key="blobs/", kind="blob", limit=1000)
+    assert asyncio.run(_plan_indexes(query)) >= {
+        "ix_blobs_object_key",
+        "ix_images_legacy_object_key",
+        "ix_image_derivatives_object_key",
+        "ix_pending_deletes_object_key",
+    }
@@ -0,0 +1,161 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.blob import Blob
+from app.models.derivative import ImageDerivative
+from app.models.image import Image
+from app.models.note import Note
+from app.models.pending_delete import PendingDelete
+from app.services import reconcile
+from app.services.reconcile import Reconciler, ReconcileLockedError
+
+OLD = datetime.now(timezone.utc) - timedelta(days=7)
+RECENT = datetime.now(timezone.utc)
+
+
+def row(key: str, kind: str = "image", created_at=None):
+    return SimpleNamespace(key=key, kind=kind, ref=f"ref:{key}", created_at=created_at)
+
+
+def run(monkeypatch, objects, rows, dry_run=True, locked=True, heads=None):
+    async def list_files():
+        for obj in objects:
+            yield obj
+
+    async def expected_keys(self):
+        for r in rows:
+            yield r
+
+    @asynccontextmanager
+    async def cluster_lock():
+        if not locked:
+            raise ReconcileLockedError("locked")
+        yield
+
+    async def head_file(name):
+        return (heads or {}).get(name)
+
+    monkeypatch.setattr(Reconciler, "_cluster_lock", staticmethod(cluster_lock))
+    monkeypatch.setattr(reconcile.storage, "list_files", list_files)
+    monkeypatch.setattr(reconcile.storage, "head_file", head_file)
+    monkeypatch.setattr(Reconciler, "_expected_keys", expected_keys)
+    reconciler = Reconciler()
+    fixes = {"orphans": [], "dangling": []}
+
+    async def enqueue_orphans(objs, grace_limit, report):
+        fixes["orphans"] += [obj["Key"] for obj in objs]
+
+    async def remove_dangling(found, report):
+        fixes["dangling"] += [key for _, _, key in found]
+
+    monkeypatch.setattr(reconciler, "_enqueue_orphans", enqueue_orphans)
+    monkeypatch.setattr(reconciler, "_remove_dangling", remove_dangling)
+    return asyncio.run(reconciler.run(dry_run=dry_run)), fixes
+
+
+def obj(key: str, modified=OLD, size=1):
+    return {"Key": key, "LastModified": modified, "Size": size}
+
+
+def test_merge_join_finds_orphans_and_dangling_rows(monkeypatch):
+    report, fixes = run(
+        monkeypatch,
+        objects=[obj("a"), obj("b", size=5), obj("d")],
+        rows=[row("a"), row("c"), row("d"), row("d", kind="pending")],
+    )
+    assert (report.objects_scanned, report.rows_scanned) == (3, 3)
+    assert (report.orphan_objects, report.orphan_bytes) == (1, 5)
+    assert report.dangling_rows == 1
+    assert fixes == {"orphans": [], "dangling": []}
+
+
+def test_recent_objects_and_rows_are_skipped(monkeypatch):
+    report, fixes = run(
+        monkeypatch,
+        objects=[obj("a", modified=RECENT), obj("b")],
+        rows=[row("c", created_at=datetime.utcnow()), row("d", created_at=None)],
+        dry_run=False,
+    )
+    assert report.skipped_recent == 2
+    assert fixes == {"orphans": ["b"], "dangling": ["d"]}
+
+
+def test_pending_rows_are_not_dangling(monkeypatch):
+    report, _ = run(monkeypatch, objects=[], rows=[row("x", kind="pending")])
+    assert report.dangling_rows == 0
+
+
+def test_pass_is_skipped_without_cluster_lock(monkeypatch):
+    with pytest.raises(ReconcileLockedError):
+        run(monkeypatch, objects=[obj("a")], rows=[], locked=False)
+
+
+PLAIN_HASHES = [c * 64 for c in "0123"]
+
+
+def test_expected_keys_are_paged_in_byte_order(pg_schema, monkeypatch):
+    """Постраничное чтение ключей из БД на Postgres; без БД тест пропускается"""
+    note_id = "0f000000-0000-4000-8000-000000000000"
+    blob_hash = "ab" * 32
+    blob_key = f"blobs/{blob_hash}"
+
+    async def scan():
+        engine = pg_schema.engine()
+        session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        monkeypatch.setattr(reconcile, "SessionLocal", session_factory)
+        monkeypatch.setattr(reconcile, "FETCH_SIZE", 2)
+        try:
+            async with session_factory() as db:
+                db.add(Note(id=note_id, title="t", content="c"))
+                # Несколько ключей одной ветки подряд пересекают границу страницы
+                db.add_all(Blob(hash=h, size=1, content_type="image/png") for h in (blob_hash, *PLAIN_HASHES))
+                await db.flush()
+                db.add_all([
+                    Image(filename="a.jpg", short_url="s1", content_type="image/jpeg", note_id=note_id),
+                    Image(filename="B.jpg", short_url="s2", content_type="image/jpeg", note_id=note_id),
+                    # Общее содержимое: ключ дает строка blobs
+                    Image(filename="c.jpg", short_url="s3", content_type="image/jpeg",
+                          note_id=note_id, blob_hash=blob_hash),
+                ])
+                db.add_all(
+                    ImageDerivative(source_key=blob_key, size=size, format="webp",
+                                    object_name=f"{blob_key}.{size}.webp", content_type="image/webp",
+                                    byte_size=1)
+                    for size in (256, 1024)
+                )
+                # Повторно поставленный ключ и ключ, совпадающий с записью blobs
+                db.add_all(PendingDelete(object_name=name) for name in ("Z-old.jpg", "Z-old.jpg", blob_key))
+                await db.commit()
+            return [(r.key, r.kind) async for r in Reconciler()._expected_keys()]
+        finally:
+            await engine.dispose()
+
+    keys = asyncio.run(scan())
+    assert keys == sorted([
+        *((f"blobs/{h}", "blob") for h in PLAIN_HASHES),
+        (blob_key, "blob"),
+        (blob_key, "pending"),
+        (f"{blob_key}.1024.webp", "derivative"),
+        (f"{blob_key}.256.webp", "derivative"),
+        (f"{note_id}/B.jpg", "image"),
+        (f"{note_id}/a.jpg", "image"),
+        ("Z-old.jpg", "pending"),
+    ])
+
+
+def test_cluster_lock_is_exclusive(postgres):
+    async def lock_twice():
+        async with Reconciler._cluster_lock():
+            with pytest.raises(ReconcileLockedError):
+                async with Reconciler._cluster_lock():
+                    pass
+        # Закрытие соединения снимает блокировку
+        async with Reconciler._cluster_lock():
+            pass
+
+    asyncio.run(lock_twice())
@@ -0,0 +1,39 @@
+from app.utils.url import (
+    BASE62_ALPHABET,
+    SHORT_URL_LENGTH,
+    SHORT_URL_SPACE,
+    encode_base62,
+    encode_short_url,
+)
+
+
+def test_encode_base62_pads_to_length():
+    assert encode_base62(0, 3) == "000"
+    assert encode_base62(61) == "z"
+    assert encode_base62(62) == "10"
+
+
+def test_short_urls_are_unique_and_fixed_length():
+    urls = [encode_short_url(number) for number in range(20000)]
+    assert len(set(urls)) == len(urls)
+    assert all(len(url) == SHORT_URL_LENGTH for url in urls)
+    assert all(set(url) <= set(BASE62_ALPHABET) for url in urls)
+
+
+def test_neighbouring_numbers_do_not_share_prefix():
+    # Перестановка не должна оставлять соседние ссылки похожими
+    prefixes = {encode_short_url(number)[:3] for number in range(1000, 1100)}
+    assert len(prefixes) > 90
+
+
+def test_short_url_is_stable():
+    assert encode_short_url(12345) == encode_short_url(12345)
+
+
+def test_numbers_beyond_space_skip_legacy_length():
+    # Старые ссылки - 8 символов, новые за пределами пространства - от 9
+    assert encode_short_url(SHORT_URL_SPACE) == encode_base62(SHORT_URL_SPACE, 9)
+    assert len(encode_short_url(SHORT_URL_SPACE)) == 9
+    assert len(encode_short_url(len(BASE62_ALPHABET) ** 9)) == 10
+    urls = {encode_short_url(SHORT_URL_SPACE + number) for number in range(1000)}
+    assert len(urls) == 1000
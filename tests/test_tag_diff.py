@@ -0,0 +1,104 @@
+"""
+Замена и добавление тегов заметки на настоящем Postgres (настройки POSTGRES_*),
+в отдельной схеме: разницу считает БД, note_count поддерживают триггеры.
+Без доступной БД тесты пропускаются.
+"""
+import asyncio
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db import query_counter
+from app.db.repositories.note import NoteRepository
+from app.db.repositories.tag import TagRepository
+from app.models.associations import note_tags
+from app.models.note import Note
+from app.models.tag import Tag
+
+
+async def _setup(engine, tag_names, linked):
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    tags = {name: Tag(id=str(uuid.uuid4()), name=name) for name in tag_names}
+    note = Note(title="note", content="text", tags=[tags[name] for name in linked])
+    async with session_factory() as db:
+        db.add_all([note, *tags.values()])
+        await db.commit()
+    return session_factory, note.id, {name: tag.id for name, tag in tags.items()}
+
+
+async def _linked(db, note_id):
+    result = await db.execute(
+        select(Tag.name).join(note_tags, note_tags.c.tag_id == Tag.id).where(note_tags.c.note_id == note_id)
+    )
+    return set(result.scalars().all())
+
+
+async def _counts(db):
+    result = await db.execute(select(Tag.name, Tag.note_count))
+    return dict(result.all())
+
+
+def test_replace_tags_applies_the_diff_in_two_statements(pg_schema):
+    async def run():
+        engine = pg_schema.engine()
+        query_counter.install(engine)
+        try:
+            session_factory, note_id, ids = await _setup(engine, ["a", "b", "c", "d"], linked=["a", "b"])
+            # Второй заметкой с тегом "b" проверяем, что счетчик не сбрасывается, а уменьшается
+            async with session_factory() as db:
+                db.add(Note(title="other", content="text", tags=[await db.get(Tag, ids["b"])]))
+                await db.commit()
+
+            async with session_factory() as db:
+                with query_counter.count_queries() as counter:
+                    await NoteRepository(Note).replace_tags(
+                        db, note_id=note_id,
+                        tag_ids=[ids["b"], ids["c"], ids["c"], str(uuid.uuid4())]
+                    )
+                await db.commit()
+            # DELETE снятых и INSERT новых, без чтения текущих связей
+            assert counter.count == 2
+
+            async with session_factory() as db:
+                assert await _linked(db, note_id) == {"b", "c"}
+                assert await _counts(db) == {"a": 0, "b": 2, "c": 1, "d": 0}
+
+            # Повтор того же набора ничего не меняет
+            async with session_factory() as db:
+                await NoteRepository(Note).replace_tags(db, note_id=note_id, tag_ids=[ids["c"], ids["b"]])
+                await db.commit()
+                assert await _linked(db, note_id) == {"b", "c"}
+                assert await _counts(db) == {"a": 0, "b": 2, "c": 1, "d": 0}
+
+            # Пустой набор снимает все теги одним DELETE
+            async with session_factory() as db:
+                with query_counter.count_queries() as counter:
+                    await NoteRepository(Note).replace_tags(db, note_id=note_id, tag_ids=[])
+                await db.commit()
+                assert counter.count == 1
+                assert await _linked(db, note_id) == set()
+                assert await _counts(db) == {"a": 0, "b": 1, "c": 0, "d": 0}
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_add_tags_to_note_links_only_missing_existing_tags(pg_schema):
+    async def run():
+        engine = pg_schema.engine()
+        try:
+            session_factory, note_id, ids = await _setup(engine, ["a", "b", "c"], linked=["a"])
+
+            async with session_factory() as db:
+                tags = await TagRepository(Tag).add_tags_to_note(
+                    db, note_id=note_id, tag_ids=[ids["a"], ids["b"], str(uuid.uuid4())]
+                )
+                assert {tag.name: tag.note_count for tag in tags} == {"a": 1, "b": 1}
+                assert await _linked(db, note_id) == {"a", "b"}
+                assert await _counts(db) == {"a": 1, "b": 1, "c": 0}
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
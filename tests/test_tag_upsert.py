@@ -0,0 +1,69 @@
+"""
+Поиск и создание тегов одним upsert на настоящем Postgres (настройки POSTGRES_*),
+в отдельной схеме. Без доступной БД тесты пропускаются.
+"""
+import asyncio
+import uuid
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db import query_counter
+from app.db.repositories.tag import TagRepository
+from app.models.tag import Tag
+
+
+def test_existing_and_new_names_resolve_in_one_statement(pg_schema):
+    async def run():
+        engine = pg_schema.engine()
+        query_counter.install(engine)
+        session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            existing = Tag(id=str(uuid.uuid4()), name="old")
+            async with session_factory() as db:
+                db.add(existing)
+                await db.commit()
+
+            async with session_factory() as db:
+                with query_counter.count_queries() as counter:
+                    tags = await TagRepository(Tag).get_or_create_many(db, names=["new", "old", "new"])
+                await db.commit()
+            assert counter.count == 1
+            assert set(tags) == {"new", "old"}
+            assert tags["old"].id == existing.id
+
+            async with session_factory() as db:
+                assert await db.scalar(select(func.count()).select_from(Tag)) == 2
+                # Повторный вызов возвращает те же строки
+                tag = await TagRepository(Tag).get_or_create(db, name="new")
+                assert tag.id == tags["new"].id
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_concurrent_upsert_waits_for_the_other_insert(pg_schema):
+    async def run():
+        engine = pg_schema.engine()
+        session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            async with session_factory() as first, session_factory() as second:
+                created = (await TagRepository(Tag).get_or_create_many(first, names=["shared"]))["shared"]
+
+                # Вторая транзакция ждет незакоммиченную вставку того же имени
+                waiting = asyncio.create_task(
+                    TagRepository(Tag).get_or_create_many(second, names=["shared"])
+                )
+                await asyncio.sleep(0.3)
+                assert not waiting.done()
+
+                await first.commit()
+                # ... и получает ту же строку вместо ошибки уникальности
+                resolved = (await asyncio.wait_for(waiting, timeout=5))["shared"]
+                assert resolved.id == created.id
+                await second.commit()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())